@@ -1,7 +1,11 @@
 # AddBookFrame.py
 
 import tkinter
-from tkinter import messagebox
+from tkinter import messagebox, ttk
+
+from collections import deque
+import queue
+import threading
 
 import FileLoader
 from FileLoader import Library
@@ -16,6 +20,10 @@ _BUTTON_LENGTH = 2
 # Constants for the entry width
 _ENTRY_WIDTH = 30
 
+# Constants for how often (in milliseconds) finished ISBN lookups are checked for, and the lookup progress bar length
+_LOOKUP_POLL_INTERVAL = 100
+_PROGRESS_LENGTH = 150
+
 
 class AddBookFrame:
     """
@@ -54,6 +62,27 @@ class AddBookFrame:
         # To hold an optional ISBN numbers
         self.isbn = tkinter.StringVar()
 
+        # To hold the ISBN lookups waiting for the lookup thread, and the lookups it has finished, as
+        # (lookup generation, ISBN) and (lookup generation, ISBN, BookAPI or None, error message or None)
+        self.pendingLookups = queue.Queue()
+        self.finishedLookups = queue.SimpleQueue()
+        self.lookupThread = None
+
+        # To hold the lookup generation, which cancelling moves on so that older lookups are ignored, the number of
+        # lookups not finished yet, and the finished lookups waiting to be shown
+        self.lookupGeneration = 0
+        self.lookupsRunning = 0
+        self.readyLookups = deque()
+
+        # To hold whether the entries hold a pulled book that was not added yet, or a pull result is being shown,
+        # in which case the next finished lookup waits
+        self.showingLookup = False
+
+        # To hold the scheduled check for finished lookups, the lookup status text and the lookup progress bar
+        self.lookupPollJob = None
+        self.lookupStatus = tkinter.StringVar()
+        self.lookupProgressBar = None
+
         # End of init()
 
     def draw(self) -> None:
@@ -115,13 +144,28 @@ class AddBookFrame:
         isbnEntry = \
             tkinter.Entry(isbnFrame, textvariable=self.isbn, font="TkFixedFont", width=_ENTRY_WIDTH)
 
+        isbnEntry.bind("<Return>", lambda event: self._ISBNEvent())
+
         isbnButton = \
             tkinter.Button(isbnFrame, text="PULL ISBN INFO", command=self._ISBNEvent,
                            width=_BUTTON_WIDTH, height=_BUTTON_LENGTH)
 
+        cancelLookupButton = \
+            tkinter.Button(isbnFrame, text="CANCEL LOOKUP", command=self._cancelLookupEvent,
+                           width=_BUTTON_WIDTH, height=_BUTTON_LENGTH)
+
+        # Construct the progress bar and status text shown while ISBN lookups run in the background
+        self.lookupProgressBar = ttk.Progressbar(isbnFrame, mode="indeterminate", length=_PROGRESS_LENGTH)
+
+        lookupStatusLabel = \
+            tkinter.Label(isbnFrame, textvariable=self.lookupStatus, font="TkFixedFont")
+
         isbnLabel.grid(row=0, column=0)
         isbnEntry.grid(row=0, column=1)
-        isbnButton.grid(row=1, column=0, pady=40)
+        isbnButton.grid(row=1, column=0, pady=(40, 10))
+        cancelLookupButton.grid(row=1, column=1, pady=(40, 10))
+        self.lookupProgressBar.grid(row=2, column=0)
+        lookupStatusLabel.grid(row=2, column=1)
 
         isbnFrame.grid(row=0, column=0, pady=20)
 
@@ -131,12 +175,16 @@ class AddBookFrame:
         addButton = \
             tkinter.Button(addCancelFrame, text="ADD BOOK", command=self._addEvent,
                            width=_BUTTON_WIDTH, height=_BUTTON_LENGTH)
+        skipButton = \
+            tkinter.Button(addCancelFrame, text="SKIP BOOK", command=self._skipEvent,
+                           width=_BUTTON_WIDTH, height=_BUTTON_LENGTH)
         cancelButton = \
             tkinter.Button(addCancelFrame, text="CANCEL", command=self.cancelFunction,
                            width=_BUTTON_WIDTH, height=_BUTTON_LENGTH)
 
         addButton.grid(row=0, column=0, padx=20)
-        cancelButton.grid(row=0, column=1)
+        skipButton.grid(row=0, column=1, padx=(0, 20))
+        cancelButton.grid(row=0, column=2)
         addCancelFrame.grid(row=2, column=0)
 
         # Draw the frame to the window
@@ -151,8 +199,12 @@ class AddBookFrame:
         :return: None
         """
 
+        # Abandon any ISBN lookups still running or waiting to be shown
+        self._cancelLookups()
+
         self.addBookFrame.destroy()
         self.addBookFrame = None
+        self.lookupProgressBar = None
 
         self._clearEntries()
 
@@ -216,39 +268,218 @@ class AddBookFrame:
 
         self._clearEntries()
 
+        # The pulled book was added, so show the next finished ISBN lookup if there is one
+        self.showingLookup = False
+        self._showNextLookup()
+
         # End of addEvent()
 
+    def _skipEvent(self) -> None:
+        """
+        Button Event Function to give the add book frame's "SKIP BOOK" button.
+
+        Clears the entries without adding the book in them, and shows the next finished ISBN lookup if there is one,
+        so a pulled book the user does not want does not hold back the lookups queued behind it.
+
+        :return: None
+        """
+
+        self._clearEntries()
+
+        self.showingLookup = False
+        self._showNextLookup()
+
+        # End of skipEvent()
+
     def _ISBNEvent(self) -> None:
         """
-        Takes the value entered into the isbn entry field and fills the other entry fields with data pulled
-        using BookAPI and the specified number.
+        Takes the value entered into the isbn entry field and looks it up using BookAPI on a background thread, so
+        the window keeps responding. The other entry fields are filled once the lookup finishes.
+
+        ISBNs entered while earlier lookups are still running are queued behind them. Their results are shown one
+        at a time, the next one once the book filled in by the previous one has been added.
 
         :return: None
         """
 
+        ISBN = self.isbn.get().strip()
+
         # If the ISBN number is empty, just show an error
-        if self.isbn.get() == "":
+        if ISBN == "":
             messagebox.showerror("ERROR", "No ISBN number was entered!")
             return
 
-        # Attempt to construct the BookAPI object for the entered ISBN number
-        bookAPIData = None
+        # If nothing else is queued, this lookup replaces the pulled book currently in the entries
+        if self.lookupsRunning == 0 and not self.readyLookups:
+            self.showingLookup = False
 
-        try:
-            bookAPIData = BookAPI(self.isbn.get())
+        # Start the lookup thread the first time it is needed, then queue the ISBN for it
+        if self.lookupThread is None:
+            self.lookupThread = threading.Thread(target=self._lookupWorker, name="ISBNLookup", daemon=True)
+            self.lookupThread.start()
 
-        except ISBNAPI.ConnectionError as message:
-            messagebox.showerror("ERROR", message)
-            return
+        self.pendingLookups.put((self.lookupGeneration, ISBN))
+        self.lookupsRunning += 1
 
-        except ISBNAPI.URLError as message:
-            messagebox.showerror("ERROR", message)
+        # Clear the ISBN entry so the next ISBN can be typed straight away
+        self.isbn.set("")
+
+        # Start checking for finished lookups, if not already doing so
+        if self.lookupPollJob is None:
+            self.lookupPollJob = self.window.after(_LOOKUP_POLL_INTERVAL, self._pollLookups)
+
+        self._updateLookupProgress()
+
+        # End of ISBNEvent()
+
+    def _cancelLookupEvent(self) -> None:
+        """
+        Button Event Function to give the add book frame's "CANCEL LOOKUP" button.
+
+        Abandons every ISBN lookup that is running, queued or waiting to be shown.
+
+        :return: None
+        """
+
+        if self.lookupsRunning == 0 and not self.readyLookups:
+            messagebox.showinfo("NO LOOKUPS", "No ISBN lookups are running.")
             return
 
-        except ISBNAPI.InputError as message:
-            messagebox.showerror("ERROR", message)
+        self._cancelLookups()
+
+        # End of cancelLookupEvent()
+
+    def _cancelLookups(self) -> None:
+        """
+        Abandons every ISBN lookup. A lookup that is already downloading cannot be interrupted, but its result is
+        ignored when it arrives.
+
+        :return: None
+        """
+
+        # Move on to a new lookup generation so the lookup thread skips, and the polling ignores, older lookups
+        self.lookupGeneration += 1
+        self.lookupsRunning = 0
+        self.readyLookups.clear()
+
+        if self.lookupPollJob is not None:
+            self.window.after_cancel(self.lookupPollJob)
+            self.lookupPollJob = None
+
+        self._updateLookupProgress()
+
+        # End of cancelLookups()
+
+    def _lookupWorker(self) -> None:
+        """
+        Runs on the lookup thread. Looks up each queued ISBN in turn and passes the results back to the Tk thread
+        through the queue of finished lookups, as tkinter widgets may only be used from the Tk thread.
+
+        :return: None
+        """
+
+        while True:
+            generation, ISBN = self.pendingLookups.get()
+
+            # Skip lookups cancelled while they were waiting
+            if generation != self.lookupGeneration:
+                continue
+
+            try:
+                self.finishedLookups.put((generation, ISBN, BookAPI(ISBN), None))
+
+            except (ISBNAPI.ConnectionError, ISBNAPI.URLError, ISBNAPI.InputError) as message:
+                self.finishedLookups.put((generation, ISBN, None, str(message)))
+
+        # End of lookupWorker()
+
+    def _pollLookups(self) -> None:
+        """
+        Collects the lookups the lookup thread has finished and shows the next one. Reschedules itself with
+        window.after while lookups are still running.
+
+        :return: None
+        """
+
+        self.lookupPollJob = None
+
+        while True:
+            try:
+                generation, ISBN, bookAPIData, errorMessage = self.finishedLookups.get_nowait()
+            except queue.Empty:
+                break
+
+            # Ignore lookups that were cancelled while they ran
+            if generation == self.lookupGeneration:
+                self.lookupsRunning -= 1
+                self.readyLookups.append((ISBN, bookAPIData, errorMessage))
+
+        if self.lookupsRunning > 0:
+            self.lookupPollJob = self.window.after(_LOOKUP_POLL_INTERVAL, self._pollLookups)
+
+        self._updateLookupProgress()
+        self._showNextLookup()
+
+        # End of pollLookups()
+
+    def _showNextLookup(self) -> None:
+        """
+        Shows the oldest finished lookup, unless the entries still hold a pulled book that has not been added or
+        skipped.
+
+        A failed lookup, or one that pulled no information, is shown as a message after which the next finished
+        lookup is shown.
+
+        :return: None
+        """
+
+        while self.readyLookups and not self.showingLookup and self.addBookFrame is not None:
+            ISBN, bookAPIData, errorMessage = self.readyLookups.popleft()
+            self._updateLookupProgress()
+
+            # The message boxes keep the Tk event loop running, so hold later lookups back until they are closed
+            self.showingLookup = True
+
+            if errorMessage is not None:
+                messagebox.showerror("ERROR", "ISBN " + ISBN + ":\n\n" + errorMessage)
+                self.showingLookup = False
+            else:
+                self.showingLookup = self._showLookupResult(bookAPIData)
+
+        # End of showNextLookup()
+
+    def _updateLookupProgress(self) -> None:
+        """
+        Updates the lookup progress bar and status text to match the lookups running and waiting to be shown.
+
+        :return: None
+        """
+
+        if self.lookupProgressBar is None:
             return
 
+        if self.lookupsRunning > 0:
+            self.lookupProgressBar.start()
+            status = f"Looking up {self.lookupsRunning} ISBN" + ("s" if self.lookupsRunning > 1 else "")
+        else:
+            self.lookupProgressBar.stop()
+            status = ""
+
+        if self.readyLookups:
+            status += (", " if status else "") + f"{len(self.readyLookups)} more ready"
+
+        self.lookupStatus.set(status)
+
+        # End of updateLookupProgress()
+
+    def _showLookupResult(self, bookAPIData: BookAPI) -> bool:
+        """
+        Fills the entry fields with the information pulled for an ISBN, and tells the user what was pulled.
+
+        :param bookAPIData: The finished lookup.
+        :return: Whether any information was pulled
+        """
+
         # To hold the amount of attributes returned from the API
         dataPointsRetrieved = 0
 
@@ -299,7 +530,9 @@ class AddBookFrame:
             messagebox.showinfo("PULL COMPLETE",
                                 completeMessage + pulledMessage + nonPulledMessage)
 
-        # End of ISBNEvent()
+        return dataPointsRetrieved > 0
+
+        # End of showLookupResult()
 
     def _clearEntries(self) -> None:
         """
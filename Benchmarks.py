@@ -0,0 +1,505 @@
+# Benchmarks.py
+#
+# Micro-benchmarks for the collection back end. Run directly to print the results:
+#
+#     python Benchmarks.py
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import math
+import os
+import random
+import shutil
+import ssl
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+import urllib.request
+
+import FileLoader
+import ISBNAPI
+import sortModules
+
+# Collection sizes each benchmark is run at
+_SIZES = [10_000, 100_000, 1_000_000]
+
+# Number of books inserted per measurement
+_INSERTS = 1_000
+
+# Number of books added per write path measurement
+_WRITES = 2_000
+
+# Number of threads adding books at once in the last journal measurement
+_JOURNAL_WRITERS = 8
+
+# Collection sizes the search benchmarks are run at, and the number of queries timed at each
+_SEARCH_SIZES = [100_000, 1_000_000]
+_QUERIES = 200
+
+# Number of ISBNs looked up per batch, the number of authors they share, the delay the stand-in ISBN server adds to
+# each response, and the worker counts the batch resolver is run with
+_ISBNS = 300
+_ISBN_AUTHORS = 40
+_STUB_LATENCY = 0.02
+_ISBN_WORKERS = [4, 16, 32]
+
+# Number of single ISBN lookups timed per way of connecting
+_CONNECTION_LOOKUPS = 300
+
+# Syllables the words of generated titles and author names are made of
+_SYLLABLES = ["ka", "lo", "mi", "ren", "sha", "ke", "spe", "ar", "tor", "vin", "el", "dra", "gon", "bel", "wi", "lam",
+              "no", "ra", "ste", "ven", "mor", "ton", "ha", "mil"]
+
+
+def _randomBook(number: int) -> FileLoader.Book:
+    """
+    Builds a book with random attributes.
+
+    :param number: The number to build the book's record id and date added from.
+    :return: The new book.
+    """
+
+    return FileLoader.Book(f"Title {random.randrange(1_000_000)}", f"Author {random.randrange(10_000)}",
+                           random.randrange(1500, 2025), random.randrange(1, 2000), 1_600_000_000 + number,
+                           str(number))
+
+    # End of randomBook()
+
+
+def _randomWord() -> str:
+    """
+    Builds a word out of two to four random syllables.
+
+    :return: The new word.
+    """
+
+    return "".join(random.choices(_SYLLABLES, k=random.randint(2, 4)))
+
+    # End of randomWord()
+
+
+def _misspell(word: str) -> str:
+    """
+    Misspells a word by dropping, doubling or swapping one of its letters.
+
+    :param word: The word to misspell.
+    :return: The misspelled word.
+    """
+
+    position = random.randrange(len(word) - 1)
+    mistake = random.randrange(3)
+
+    if mistake == 0:
+        return word[:position] + word[position + 1:]
+    elif mistake == 1:
+        return word[:position] + word[position] + word[position:]
+
+    return word[:position] + word[position + 1] + word[position] + word[position + 2:]
+
+    # End of misspell()
+
+
+def benchmarkSortedInsert() -> None:
+    """
+    Measures inserting books into a library sorted by author, the way addBook does.
+
+    Prints the average time per insert and the average number of sort key evaluations per insert, which follows
+    log2(n) because the new book is placed by binary search.
+
+    :return: None
+    """
+
+    print("Sorted insert (library sorted by author)")
+    print(f"{'books':>10} {'us/insert':>10} {'keys/insert':>12} {'log2(n)':>8}")
+
+    for size in _SIZES:
+        library = FileLoader.Library("benchmark", [_randomBook(number) for number in range(size)])
+        sortModules.sortByAuthor(library)
+
+        # Count the key evaluations made while inserting
+        keyFunction = sortModules.SORT_KEYS["author"]
+        keyEvaluations = 0
+
+        def countingKey(book):
+            nonlocal keyEvaluations
+            keyEvaluations += 1
+            return keyFunction(book)
+
+        sortModules.SORT_KEYS["author"] = countingKey
+
+        try:
+            start = time.perf_counter()
+
+            for number in range(size, size + _INSERTS):
+                library.insertBook(_randomBook(number))
+
+            elapsed = time.perf_counter() - start
+        finally:
+            sortModules.SORT_KEYS["author"] = keyFunction
+
+        print(f"{size:>10} {elapsed / _INSERTS * 1e6:>10.2f} {keyEvaluations / _INSERTS:>12.1f} "
+              f"{math.log2(size):>8.1f}")
+
+    # End of benchmarkSortedInsert()
+
+
+def benchmarkJournaledWrites() -> None:
+    """
+    Measures adding books to a flat collection through three write paths: plain .book file writes (not crash
+    safe), .book file writes each followed by an fsync (crash safe), and the journal, which is crash safe and
+    shares one fsync between the changes made while the previous one runs. The journal is measured with books added
+    one at a time, the way the GUI does, and with _JOURNAL_WRITERS threads writing at once.
+
+    :return: None
+    """
+
+    print("Adding books to a flat collection")
+    print(f"{'write path':>24} {'books/s':>10} {'fsyncs':>8}")
+
+    def fsyncBookFiles(library, books):
+        for path in FileLoader._writeBookFiles(library, books):
+            with open(path, "ab") as bookFile:
+                os.fsync(bookFile.fileno())
+
+    def writeBooks(library, count):
+        for number in range(count):
+            FileLoader._writeBooks(library, [FileLoader._newBook(f"Title {number}", "Author", 2000, 100)])
+
+    for name in ("plain", "fsync every book", "journal", f"journal, {_JOURNAL_WRITERS} writers"):
+        directory = tempfile.mkdtemp()
+
+        try:
+            library = FileLoader.loadFile(directory, journal=name.startswith("journal"))
+            originalWriteBooks = FileLoader._writeBooks
+
+            if name == "fsync every book":
+                FileLoader._writeBooks = fsyncBookFiles
+
+            try:
+                start = time.perf_counter()
+
+                if name.endswith("writers"):
+                    writers = [threading.Thread(target=writeBooks, args=(library, _WRITES // _JOURNAL_WRITERS))
+                               for _ in range(_JOURNAL_WRITERS)]
+
+                    for writer in writers:
+                        writer.start()
+
+                    for writer in writers:
+                        writer.join()
+                else:
+                    writeBooks(library, _WRITES)
+
+                elapsed = time.perf_counter() - start
+            finally:
+                FileLoader._writeBooks = originalWriteBooks
+
+            fsyncs = library.journal.commits if library.journal is not None else \
+                (_WRITES if name == "fsync every book" else 0)
+            print(f"{name:>24} {_WRITES / elapsed:>10.0f} {fsyncs:>8}")
+
+            if library.journal is not None:
+                library.journal.close()
+        finally:
+            shutil.rmtree(directory)
+
+    # End of benchmarkJournaledWrites()
+
+
+def benchmarkSearch() -> None:
+    """
+    Measures building the full-text and trigram indexes of a library and querying them: exact word queries,
+    prefix queries, and fuzzy queries for misspelled author names.
+
+    Titles are three and author names two words drawn from vocabularies of generated words. Fuzzy recall is the
+    share of misspelled queries that still find the book the author name was taken from.
+
+    :return: None
+    """
+
+    print("Full-text and fuzzy search")
+    print(f"{'books':>10} {'build s':>8} {'trigram s':>10} {'word ms':>8} {'prefix ms':>10} {'fuzzy ms':>9} "
+          f"{'fuzzy recall':>13}")
+
+    titleWords = [_randomWord() for number in range(50_000)]
+    authorWords = [_randomWord() for number in range(10_000)]
+
+    for size in _SEARCH_SIZES:
+        books = [FileLoader.Book(" ".join(random.choices(titleWords, k=3)), " ".join(random.choices(authorWords, k=2)),
+                                 2000, 100, 1_600_000_000 + number, str(number)) for number in range(size)]
+        library = FileLoader.Library("benchmark", books)
+
+        start = time.perf_counter()
+        index = library.useIndex("text")
+        buildSeconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        index.fuzzySearch(authorWords[0])
+        trigramSeconds = time.perf_counter() - start
+
+        def medianMilliseconds(search, queries):
+            timings = []
+
+            for query in queries:
+                start = time.perf_counter()
+                search(query)
+                timings.append(time.perf_counter() - start)
+
+            return statistics.median(timings) * 1e3
+
+        sample = random.sample(books, _QUERIES)
+        wordMilliseconds = medianMilliseconds(index.search, [book.author.split()[0] for book in sample])
+        prefixMilliseconds = medianMilliseconds(index.search, [book.title.split()[0][:4] + "*" for book in sample])
+
+        misspelled = [_misspell(book.author.split()[-1]) for book in sample]
+        fuzzyMilliseconds = medianMilliseconds(index.fuzzySearch, misspelled)
+        fuzzyHits = sum(1 for query, book in zip(misspelled, sample)
+                        if book.recordId in index.fuzzySearch(query, limit=size)) / _QUERIES
+
+        print(f"{size:>10} {buildSeconds:>8.2f} {trigramSeconds:>10.2f} {wordMilliseconds:>8.2f} "
+              f"{prefixMilliseconds:>10.2f} {fuzzyMilliseconds:>9.2f} {fuzzyHits:>12.0%}")
+
+    # End of benchmarkSearch()
+
+
+class _StubISBNHandler(BaseHTTPRequestHandler):
+    """
+    Answers edition and author requests the way Open Library does, after waiting the server's latency in seconds to
+    stand in for the network. Editions are named after their ISBN and share _ISBN_AUTHORS authors.
+
+    """
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True  # the headers and body are written separately, which Nagle would hold back
+
+    def do_GET(self) -> None:
+        time.sleep(self.server.latency)
+
+        name = self.path.rsplit("/", 1)[-1].removesuffix(".json")
+
+        if self.path.startswith("/isbn/"):
+            response = {"title": f"Title {name}", "publish_date": "March 3, 1999", "number_of_pages": 100,
+                        "authors": [{"key": f"/authors/A{int(name) % _ISBN_AUTHORS}"}]}
+        else:
+            response = {"name": f"Author {name}"}
+
+        body = json.dumps(response).encode()
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *arguments) -> None:
+        pass
+
+    # End of StubISBNHandler
+
+
+class _StubISBNServer(ThreadingHTTPServer):
+    """
+    Serves _StubISBNHandler, with a listen backlog deep enough that connections from every worker thread are
+    accepted straight away.
+
+    """
+
+    request_queue_size = 128
+    daemon_threads = True
+    latency = _STUB_LATENCY
+
+    # End of StubISBNServer
+
+
+def benchmarkISBNLookups() -> None:
+    """
+    Measures looking up a box of ISBNs against a local stand-in for Open Library: one BookAPI after another, the way
+    the GUI does, resolve_isbns with a growing number of worker threads, and two batches of the same ISBNs at once,
+    whose identical requests are coalesced. The response cache is turned off so every lookup goes to the server.
+
+    :return: None
+    """
+
+    print(f"Looking up {_ISBNS} ISBNs sharing {_ISBN_AUTHORS} authors ({_STUB_LATENCY * 1e3:.0f} ms per response)")
+    print(f"{'lookup':>24} {'seconds':>8} {'ISBNs/s':>8} {'requests':>9}")
+
+    server = _StubISBNServer(("127.0.0.1", 0), _StubISBNHandler)
+    serverThread = threading.Thread(target=server.serve_forever, daemon=True)
+    serverThread.start()
+
+    baseURL = ISBNAPI.BASE_URL
+    ISBNAPI.BASE_URL = f"http://127.0.0.1:{server.server_port}"
+    ISBNAPI.open_cache(None)
+
+    ISBNs = [str(number) for number in range(_ISBNS)]
+
+    try:
+        start = time.perf_counter()
+
+        for ISBN in ISBNs:
+            ISBNAPI.BookAPI(ISBN)
+
+        elapsed = time.perf_counter() - start
+        print(f"{'one at a time':>24} {elapsed:>8.2f} {_ISBNS / elapsed:>8.0f} {2 * _ISBNS:>9}")
+
+        for workers in _ISBN_WORKERS:
+            start = time.perf_counter()
+            results = ISBNAPI.resolve_isbns(ISBNs, workers=workers, rate=None)
+            elapsed = time.perf_counter() - start
+
+            assert all(isinstance(result, ISBNAPI.BookAPI) for result in results.values())
+            print(f"{f'batch, {workers} workers':>24} {elapsed:>8.2f} {_ISBNS / elapsed:>8.0f} "
+                  f"{_ISBNS + _ISBN_AUTHORS:>9}")
+
+        # Two overlapping batches of the same ISBNs share every download through the request coalescer
+        fetches = ISBNAPI.request_coalescer.fetches
+        coalesced = ISBNAPI.request_coalescer.coalesced
+        batches = [threading.Thread(target=ISBNAPI.resolve_isbns, args=(ISBNs, _ISBN_WORKERS[-1], None))
+                   for batch in range(2)]
+
+        start = time.perf_counter()
+
+        for batch in batches:
+            batch.start()
+
+        for batch in batches:
+            batch.join()
+
+        elapsed = time.perf_counter() - start
+        print(f"{'2 batches at once':>24} {elapsed:>8.2f} {2 * _ISBNS / elapsed:>8.0f} "
+              f"{ISBNAPI.request_coalescer.fetches - fetches:>9} "
+              f"({ISBNAPI.request_coalescer.coalesced - coalesced} coalesced)")
+
+        rate = ISBNAPI.BATCH_RATE * 10
+        start = time.perf_counter()
+        ISBNAPI.resolve_isbns(ISBNs, workers=_ISBN_WORKERS[-1], rate=rate, burst=ISBNAPI.BATCH_BURST)
+        elapsed = time.perf_counter() - start
+        print(f"{f'batch, {rate:.0f} requests/s':>24} {elapsed:>8.2f} {_ISBNS / elapsed:>8.0f} "
+              f"{_ISBNS + _ISBN_AUTHORS:>9}")
+    finally:
+        ISBNAPI.BASE_URL = baseURL
+        ISBNAPI.close_cache()
+        server.shutdown()
+        server.server_close()
+
+    # End of benchmarkISBNLookups()
+
+
+def _selfSignedCertificate(directory: str):
+    """
+    Makes a self-signed certificate for 127.0.0.1 with the openssl command.
+
+    :param directory: The directory to write the certificate and key to.
+    :return: The paths of the certificate and key files, or None if openssl is not available.
+    """
+
+    certificate = os.path.join(directory, "stub.crt")
+    key = os.path.join(directory, "stub.key")
+
+    try:
+        subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1", "-subj",
+                        "/CN=127.0.0.1", "-addext", "subjectAltName=IP:127.0.0.1", "-keyout", key,
+                        "-out", certificate], check=True, capture_output=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+    return certificate, key
+
+    # End of selfSignedCertificate()
+
+
+def benchmarkISBNConnections() -> None:
+    """
+    Measures single ISBN lookups (an edition and an author request) against a local stand-in for Open Library that
+    answers straight away, over plain HTTP and over TLS: opening a new connection for every request with urlopen,
+    the way ISBNAPI used to, and reusing keep-alive connections from a ConnectionPool. The difference is the cost
+    of the handshakes the pool saves. The TLS rows are skipped if openssl is not available to make a certificate.
+
+    :return: None
+    """
+
+    print(f"Single ISBN lookups against a local server (median of {_CONNECTION_LOOKUPS})")
+    print(f"{'connection':>24} {'ms/lookup':>10} {'connections':>12}")
+
+    directory = tempfile.mkdtemp()
+    certificate = _selfSignedCertificate(directory)
+
+    try:
+        for scheme in ("http", "https"):
+            if scheme == "https" and certificate is None:
+                print(f"{'https':>24} {'skipped, no openssl':>23}")
+                continue
+
+            server = _StubISBNServer(("127.0.0.1", 0), _StubISBNHandler)
+            server.latency = 0
+            clientContext = None
+
+            if scheme == "https":
+                serverContext = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+                serverContext.load_cert_chain(*certificate)
+                server.socket = serverContext.wrap_socket(server.socket, server_side=True)
+                clientContext = ssl.create_default_context(cafile=certificate[0])
+
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            baseURL = f"{scheme}://127.0.0.1:{server.server_port}"
+
+            def urlopenLookup(ISBN):
+                for url in (f"{baseURL}/isbn/{ISBN}.json", f"{baseURL}/authors/A{int(ISBN) % _ISBN_AUTHORS}.json"):
+                    with urllib.request.urlopen(url, context=clientContext) as response:
+                        json.loads(response.read())
+
+                return 2
+
+            pool = ISBNAPI.ConnectionPool(ssl_context=clientContext)
+
+            def pooledLookup(ISBN):
+                for url in (f"{baseURL}/isbn/{ISBN}.json", f"{baseURL}/authors/A{int(ISBN) % _ISBN_AUTHORS}.json"):
+                    status, body = pool.get(url)
+                    json.loads(body)
+
+                return pool.connections_opened
+
+            try:
+                for name, lookup in (("urlopen", urlopenLookup), ("keep-alive pool", pooledLookup)):
+                    timings = []
+                    connections = 0
+
+                    for number in range(_CONNECTION_LOOKUPS):
+                        start = time.perf_counter()
+                        opened = lookup(str(number))
+                        timings.append(time.perf_counter() - start)
+                        connections = opened if lookup is pooledLookup else connections + opened
+
+                    print(f"{f'{scheme}, {name}':>24} {statistics.median(timings) * 1e3:>10.3f} {connections:>12}")
+            finally:
+                pool.close()
+                server.shutdown()
+                server.server_close()
+    finally:
+        shutil.rmtree(directory)
+
+    # End of benchmarkISBNConnections()
+
+
+def main() -> None:
+    """
+    Runs every benchmark.
+
+    :return: None
+    """
+
+    random.seed(0)
+
+    benchmarkSortedInsert()
+    benchmarkJournaledWrites()
+    benchmarkSearch()
+    benchmarkISBNLookups()
+    benchmarkISBNConnections()
+
+    # End of main()
+
+
+if __name__ == '__main__':
+    main()
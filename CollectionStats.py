@@ -0,0 +1,73 @@
+import heapq
+import time
+
+### Collection statistics kept up to date as books come and go
+###
+### A CollectionStats holds running counters over a library: the number of books and their total page count, the
+### number of books per author, a histogram of publication decades and a histogram of the months books were added in
+### (local time, as the GUI shows dates added). Like a TextIndex it is one of the library's indexes (see
+### Library.useIndex): it is built in one pass over the books, then every insert and remove adjusts the counters, so
+### a statistic costs a dict lookup, or one step per bucket for the histograms, however large the library is.
+
+class CollectionStats:
+    'counters and histograms over the books of a library, updated by every insert and remove'
+    def __init__(self):
+        self.bookCount = 0
+        self.totalPages = 0
+        self._authors = {} #author -> number of books
+        self._decades = {} #first year of a decade -> number of books published in it
+        self._months = {} #(year, month) -> number of books added in it
+
+    def __len__(self):
+        return self.bookCount
+
+    def build(self, books):
+        'takes every book of a library. Replaces the counters with those of these books in one pass. Returns nothing'
+        self.__init__()
+        for book in books:
+            self.add(book)
+
+    def add(self, book):
+        'takes a book added to the library. Counts it. Returns nothing'
+        self._count(book, 1)
+
+    def remove(self, book):
+        'takes a book removed from the library. Stops counting it. Returns nothing'
+        self._count(book, -1)
+
+    def averagePages(self):
+        'Returns the average page length of the books, 0 for an empty library'
+        return self.totalPages / self.bookCount if self.bookCount else 0
+
+    def booksBy(self, author):
+        'takes an author. Returns the number of books by exactly that author'
+        return self._authors.get(author, 0)
+
+    def authorCounts(self):
+        'Returns a dict of author -> number of books'
+        return dict(self._authors)
+
+    def topAuthors(self, count):
+        'takes the number of authors to return. Returns a list of (author, number of books) for the authors with the most books, most first'
+        return heapq.nsmallest(count, self._authors.items(), key = lambda entry: (-entry[1], entry[0]))
+
+    def decadeHistogram(self):
+        'Returns a list of (first year of the decade, number of books published in it), earliest decade first'
+        return sorted(self._decades.items())
+
+    def monthlyAdditions(self):
+        'Returns a list of ((year, month), number of books added in it), earliest month first'
+        return sorted(self._months.items())
+
+    def _count(self, book, change):
+        'takes a book and 1 to count it or -1 to stop counting it. Adjusts every counter. Returns nothing'
+        self.bookCount += change
+        self.totalPages += change * book.pageLength
+        added = time.localtime(book.dateAdded)
+        for counts, bucket in ((self._authors, book.author), (self._decades, book.yearPub // 10 * 10),
+                               (self._months, (added.tm_year, added.tm_mon))):
+            total = counts.get(bucket, 0) + change
+            if total:
+                counts[bucket] = total
+            else: #the last book in the bucket is gone
+                del counts[bucket]
@@ -0,0 +1,145 @@
+# CollectionTools.py
+#
+# Command line tools for working with collections outside the GUI:
+#
+#     python CollectionTools.py import <collection directory> <books.csv | books.jsonl> [--batch-size N]
+#     python CollectionTools.py export <collection directory> <books.csv | books.jsonl | books.bookcol>
+#     python CollectionTools.py migrate <collection directory> [--format packed | sharded | sqlite]
+#     python CollectionTools.py stats <collection directory> [--authors N]
+
+import argparse
+import sys
+
+import FileLoader
+
+
+def _importCommand(arguments: argparse.Namespace) -> None:
+    """
+    Streams the books of a CSV or JSONL file into a collection, printing the progress as it goes. The collection is
+    written to without being loaded, so only one batch of books is held in memory at a time.
+
+    :param arguments: The parsed command line arguments.
+    :return: None
+    """
+
+    def showProgress(rows: int, rowsPerSecond: float) -> None:
+        print(f"\rImported {rows} books ({rowsPerSecond:.0f} rows/s)", end="", flush=True)
+
+    stats = FileLoader.importBooks(arguments.collection, arguments.source, arguments.batch_size, showProgress)
+
+    print(f"\nImported {stats['rows']} books in {stats['seconds']:.2f} s ({stats['rowsPerSecond']:.0f} rows/s)")
+
+    # End of importCommand()
+
+
+def _exportCommand(arguments: argparse.Namespace) -> None:
+    """
+    Streams the books of a collection into a CSV, JSONL or columnar file.
+
+    :param arguments: The parsed command line arguments.
+    :return: None
+    """
+
+    exported = FileLoader.exportBooks(arguments.collection, arguments.destination)
+
+    print(f"Exported {exported} books to {arguments.destination}")
+
+    # End of exportCommand()
+
+
+def _migrateCommand(arguments: argparse.Namespace) -> None:
+    """
+    Converts a directory of .book files into a packed or sharded collection, or a directory of .book files or a
+    packed collection into an SQLite collection.
+
+    :param arguments: The parsed command line arguments.
+    :return: None
+    """
+
+    if arguments.format == "sqlite":
+        library = FileLoader.migrateToSQLite(arguments.collection)
+    elif arguments.format == "sharded":
+        library = FileLoader.migrateToSharded(arguments.collection)
+    else:
+        library = FileLoader.migrateToPacked(arguments.collection)
+
+    print(f"Converted {len(library)} books in {arguments.collection} to the {arguments.format} format")
+
+    # End of migrateCommand()
+
+
+def _statsCommand(arguments: argparse.Namespace) -> None:
+    """
+    Prints the statistics of a collection: its book and page counts, the authors with the most books, and the books
+    per publication decade and per month added.
+
+    :param arguments: The parsed command line arguments.
+    :return: None
+    """
+
+    library = FileLoader.loadFile(arguments.collection, FileLoader.LOAD_WORKERS, indexes=("stats",))
+    stats = library.statistics()
+
+    print(f"{stats.bookCount} books, {stats.totalPages} pages ({stats.averagePages():.1f} pages per book)")
+
+    print("\nAuthors with the most books:")
+    for author, books in stats.topAuthors(arguments.authors):
+        print(f"  {books:8}  {author}")
+
+    print("\nBooks per publication decade:")
+    for decade, books in stats.decadeHistogram():
+        print(f"  {decade}s  {books:8}")
+
+    print("\nBooks added per month:")
+    for (year, month), books in stats.monthlyAdditions():
+        print(f"  {year}-{month:02}  {books:8}")
+
+    # End of statsCommand()
+
+
+def main() -> None:
+    """
+    Parses the command line and runs the requested tool.
+
+    :return: None
+    """
+
+    parser = argparse.ArgumentParser(description="Library Collection Manager collection tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    importParser = commands.add_parser("import", help="stream books from a .csv or .jsonl file into a collection")
+    importParser.add_argument("collection", help="the collection directory")
+    importParser.add_argument("source", help="the .csv (with a header row) or .jsonl file of books")
+    importParser.add_argument("--batch-size", type=int, default=FileLoader.IMPORT_BATCH_SIZE,
+                              help="number of books written at a time")
+    importParser.set_defaults(function=_importCommand)
+
+    exportParser = commands.add_parser("export", help="stream a collection into a .csv, .jsonl or .bookcol file")
+    exportParser.add_argument("collection", help="the collection directory")
+    exportParser.add_argument("destination", help="the .csv, .jsonl or .bookcol (columnar) file to write")
+    exportParser.set_defaults(function=_exportCommand)
+
+    migrateParser = commands.add_parser("migrate", help="convert a collection into a packed, sharded or SQLite collection")
+    migrateParser.add_argument("collection", help="the collection directory")
+    migrateParser.add_argument("--format", choices=["packed", "sharded", "sqlite"], default="packed",
+                               help="the format to convert to (default: packed)")
+    migrateParser.set_defaults(function=_migrateCommand)
+
+    statsParser = commands.add_parser("stats", help="show the book counts, top authors and histograms of a collection")
+    statsParser.add_argument("collection", help="the collection directory")
+    statsParser.add_argument("--authors", type=int, default=10, help="number of top authors to show")
+    statsParser.set_defaults(function=_statsCommand)
+
+    arguments = parser.parse_args()
+
+    try:
+        arguments.function(arguments)
+    except (FileLoader.InputError, FileLoader.BadPathError) as message:
+        print(f"\nERROR: {message}", file=sys.stderr)
+        sys.exit(1)
+
+    # End of main()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,230 @@
+import ctypes
+import ctypes.util
+import os
+from pathlib import Path
+import queue
+import select
+import struct
+import threading
+
+import FileLoader
+
+### Watching a collection for changes made outside the program
+###
+### A CollectionWatcher follows the .book files of an open flat or sharded library. A background thread notices
+### files being written, renamed or removed, using inotify on Linux and comparing the mtime and size of every file
+### otherwise (or when usePolling is set, e.g. for network filesystems where inotify sees no remote changes).
+### The thread only queues the names of changed files; applyChanges, called from the thread that owns the library
+### (the GUI calls it from window.after), reads those files and adds, replaces or removes just those books.
+
+POLL_INTERVAL = 2.0 #seconds between directory scans when polling
+_INOTIFY_WAIT = 0.25 #seconds the inotify thread waits for events before checking whether it was stopped
+
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_MOVE_SELF = 0x00000800
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ISDIR = 0x40000000
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_WATCH_MASK = _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE | _IN_DELETE_SELF | _IN_MOVE_SELF
+_EVENT_HEADER = struct.Struct("iIII") #watch descriptor, mask, cookie, name length
+
+_WRITTEN = "written"
+_REMOVED = "removed"
+_RESCAN = "rescan" #events were lost, compare the whole directory against the library
+_GONE = "gone" #the collection directory itself was removed
+
+class CollectionWatcher:
+    'keeps an open flat or sharded library in step with changes made to its .book files outside the program'
+    def __init__(self,library,usePolling = False,interval = POLL_INTERVAL):
+        if library.layout not in ("flat", "sharded") or library.readOnly:
+            raise FileLoader.InputError("Only flat and sharded collections can be watched")
+        self.library = library
+        self.interval = interval
+        self._sharded = library.layout == "sharded"
+        self._events = queue.SimpleQueue() #(kind, name relative to the collection) from the watching thread
+        self._stop = threading.Event()
+        self._thread = None
+        self._inotify = None if usePolling else _Inotify.open()
+        self.backend = "polling" if self._inotify is None else "inotify"
+
+    def start(self):
+        'starts watching on a background thread. Returns nothing'
+        if self._inotify is not None:
+            self._watchDirectory(self.library.path, "")
+            if self._sharded:
+                with os.scandir(self.library.path) as entries:
+                    for entry in entries:
+                        if entry.is_dir() and len(entry.name) == 2:
+                            self._watchDirectory(entry.path, entry.name + "/")
+            target = self._readInotify
+        else:
+            self._snapshot = self._scan()
+            target = self._poll
+        self._thread = threading.Thread(target = target, name = "CollectionWatcher", daemon = True)
+        self._thread.start()
+
+    def stop(self):
+        'stops watching. Returns nothing'
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+
+    def applyChanges(self):
+        'applies the changes noticed since the last call to the library. Call it from the thread that uses the library. Returns a dict with the number of books added, changed and removed, and whether the whole collection directory is gone'
+        latest = {} #name -> the last kind of change seen for it, so a file written many times is read once
+        rescan = False
+        gone = False
+        while True:
+            try:
+                kind, name = self._events.get_nowait()
+            except queue.Empty:
+                break
+            if kind == _GONE:
+                gone = True
+            elif kind == _RESCAN:
+                rescan = True
+            else:
+                latest.pop(name, None)
+                latest[name] = kind
+        gone = gone or not os.path.isdir(self.library.path) #inotify only reports the directory gone once no file in it is open
+        result = {"added": 0, "changed": 0, "removed": 0, "collectionRemoved": gone}
+        if gone:
+            return result
+        if rescan:
+            latest.update(self._rescanChanges())
+        for name, kind in latest.items():
+            recordId = Path(name).stem
+            if kind == _REMOVED:
+                if recordId in self.library:
+                    self.library.removeBook(recordId)
+                    result["removed"] += 1
+                continue
+            book = FileLoader._readBookFile(os.path.join(self.library.path, name))
+            if book is None: #removed again before it was read, or not a valid .book file
+                if recordId in self.library and not os.path.exists(os.path.join(self.library.path, name)):
+                    self.library.removeBook(recordId)
+                    result["removed"] += 1
+                continue
+            existing = self.library.getBook(recordId)
+            if existing == book: #the program's own write, or a file rewritten with the same book
+                continue
+            self.library.insertBook(book)
+            result["changed" if existing is not None else "added"] += 1
+        return result
+
+    def _rescanChanges(self):
+        'Returns a dict of name -> kind of change for every .book file the library and the directory disagree on after events were lost'
+        onDisk = {Path(name).stem: name for name, bookPath, stat in
+                  FileLoader._scanBookFiles(Path(self.library.path), self._sharded, withStat = False)}
+        inLibrary = set(self.library.recordIds())
+        changes = {onDisk[recordId]: _WRITTEN for recordId in onDisk.keys() - inLibrary}
+        changes.update((recordId + ".book", _REMOVED) for recordId in inLibrary - onDisk.keys()) #removals only use the record id
+        return changes
+
+    def _watchDirectory(self, directory, prefix):
+        'takes a directory and the prefix of the names in it. Adds an inotify watch for it. Returns nothing'
+        self._inotify.addWatch(directory, prefix)
+
+    def _readInotify(self):
+        'the watching thread when inotify is available. Queues a change for every inotify event on a .book file'
+        while not self._stop.is_set():
+            for prefix, mask, name in self._inotify.read(_INOTIFY_WAIT):
+                if mask & _IN_Q_OVERFLOW:
+                    self._events.put((_RESCAN, None))
+                elif prefix == "" and mask & (_IN_DELETE_SELF | _IN_MOVE_SELF):
+                    self._events.put((_GONE, None))
+                elif mask & _IN_ISDIR:
+                    if self._sharded and prefix == "" and mask & (_IN_CREATE | _IN_MOVED_TO) and len(name) == 2:
+                        try:
+                            self._watchDirectory(os.path.join(self.library.path, name), name + "/")
+                        except OSError: #removed again straight away
+                            pass
+                        self._events.put((_RESCAN, None)) #files may have landed in it before the watch was added
+                elif name.endswith(".book"):
+                    if mask & (_IN_CLOSE_WRITE | _IN_MOVED_TO):
+                        self._events.put((_WRITTEN, prefix + name))
+                    elif mask & (_IN_DELETE | _IN_MOVED_FROM):
+                        self._events.put((_REMOVED, prefix + name))
+
+    def _poll(self):
+        'the watching thread when polling. Compares the mtime and size of every .book file every interval seconds'
+        while not self._stop.wait(self.interval):
+            try:
+                snapshot = self._scan()
+            except FileNotFoundError:
+                self._events.put((_GONE, None))
+                return
+            for name, signature in snapshot.items():
+                if self._snapshot.get(name) != signature:
+                    self._events.put((_WRITTEN, name))
+            for name in self._snapshot.keys() - snapshot.keys():
+                self._events.put((_REMOVED, name))
+            self._snapshot = snapshot
+
+    def _scan(self):
+        'Returns a dict of name -> (mtime, size) for every .book file in the collection'
+        return {name: (stat.st_mtime_ns, stat.st_size)
+                for name, bookPath, stat in FileLoader._scanBookFiles(Path(self.library.path), self._sharded)}
+
+class _Inotify:
+    'a Linux inotify instance used through ctypes'
+    def __init__(self, libc, descriptor):
+        self._libc = libc
+        self._descriptor = descriptor
+        self._prefixes = {} #watch descriptor -> prefix of the names in the watched directory
+
+    @classmethod
+    def open(cls):
+        'Returns a new inotify instance, or None when inotify is not available on this system'
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno = True)
+            descriptor = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        except (OSError, AttributeError, TypeError): #not Linux, or no usable C library
+            return None
+        if descriptor < 0: #e.g. the per-user instance limit is reached
+            return None
+        return cls(libc, descriptor)
+
+    def addWatch(self, directory, prefix):
+        'takes a directory and the prefix to give the names of its events. Starts watching it. Returns nothing'
+        watch = self._libc.inotify_add_watch(self._descriptor, os.fsencode(directory), _WATCH_MASK)
+        if watch < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error), directory)
+        self._prefixes[watch] = prefix
+
+    def read(self, timeout):
+        'takes the seconds to wait for events. Returns a list of (prefix, mask, name) for the events read'
+        ready, _, _ = select.select([self._descriptor], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self._descriptor, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            watch, mask, cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+            nameStart = offset + _EVENT_HEADER.size
+            name = os.fsdecode(data[nameStart:nameStart + length].rstrip(b"\0"))
+            offset = nameStart + length
+            if mask & _IN_IGNORED: #the watched directory is gone
+                self._prefixes.pop(watch, None)
+                continue
+            events.append((self._prefixes.get(watch, ""), mask, name))
+        return events
+
+    def close(self):
+        os.close(self._descriptor)
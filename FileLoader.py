@@ -1,7 +1,26 @@
-from collections import namedtuple
+from array import array
+import atexit
+from collections import OrderedDict
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
+import csv
+from bisect import bisect_left
+from itertools import accumulate, islice
+from operator import attrgetter
+import json
+import mmap
 import os
 from pathlib import Path
+import sqlite3
+import struct
+import sys
+import threading
 import time
+import zlib
+
+import CollectionStats
+import SearchIndex
+import sortModules
 
 class InputError(Exception):
     pass
@@ -15,12 +34,999 @@ class BadPathError(Exception):
 class EmptyDirectory(Exception):
     pass
 
+class ReadOnlyError(Exception):
+    pass
+
+COMPACT_FRACTION = 0.25 #share of a library's slot array tombstones may fill before it is compacted
+
 class Library:
-    def __init__(self,path,bookList = list):
+    'a loaded collection. Books are kept in a slot array indexed by record id, so lookups, existence checks and deletes are constant time'
+    readOnly = False #see MappedLibrary
+    journal = None #the Journal changes are written through, see loadFile
+    def __init__(self,path,bookList = (),layout = "flat"):
         self.path = path
+        self._indexes = {} #index name -> index kept up to date by every insert and remove, see useIndex
         self.bookList = bookList
+        self.layout = layout #"flat" for one .book file per book, "sharded" for .book files in hashed subdirectories, "packed" for a single segment file plus offset index, "sqlite" for SQLiteLibrary
+
+    @property
+    def bookList(self):
+        'the books of the library in their current order'
+        return BookList(self)
+
+    @bookList.setter
+    def bookList(self, books):
+        self._slots = list(books) #a removed book leaves None (a tombstone) in its slot until the next compaction
+        self._index = {book.recordId: slot for slot, book in enumerate(self._slots)} #record id -> slot
+        self._tombstones = 0
+        self._liveOrder = None #the live slots in slot order, for reading in slot order while there are tombstones
+        self._orders = {} #sort key -> cached order permutation of live slot numbers, see sortModules
+        self._activeOrder = None #the sort key bookList is read in, None for slot order
+        for index in self._indexes.values():
+            index.build(self._slots)
+
+    def __len__(self):
+        return len(self._slots) - self._tombstones
+
+    def __contains__(self, recordId):
+        return recordId in self._index
+
+    def getBook(self, recordId):
+        'takes a record id. Returns the book with that id, or None if the library does not hold it'
+        slot = self._index.get(recordId)
+        return None if slot is None else self._book(slot)
+
+    def recordIds(self):
+        'Returns the record ids of every book in the library, without reading any book'
+        return list(self._index)
+
+    def positionOf(self, recordId):
+        'takes a record id. Returns the position of that book in bookList, found by binary search when a sort order is active, or raises KeyError if the library does not hold it'
+        slot = self._index[recordId]
+        slots, order = self._view()
+        if order is None:
+            return slot
+        if self._activeOrder is None: #slot order with tombstones left out
+            return bisect_left(order, slot)
+        return sortModules.positionInOrder(slots, order, slot, self._activeOrder)
+
+    def useIndex(self, name):
+        'takes the name of an index from INDEX_TYPES. Returns that index of the library, building it in one pass the first time it is used. From then on every insert and remove updates it'
+        index = self._indexes.get(name)
+        if index is None:
+            index = INDEX_TYPES[name]()
+            index.build(self.bookList)
+            self._indexes[name] = index
+        return index
+
+    def search(self, query, limit = SearchIndex.SEARCH_LIMIT):
+        'takes a full-text query over titles and authors (see SearchIndex) and the most hits to return. Returns the matching books, best match first'
+        return [self.getBook(recordId) for recordId in self.useIndex("text").search(query, limit)]
+
+    def fuzzySearch(self, query, threshold = SearchIndex.FUZZY_THRESHOLD, limit = SearchIndex.SEARCH_LIMIT):
+        'takes a query of possibly misspelled title and author words (see SearchIndex), the least trigram similarity (0 to 1) a word needs to match and the most hits to return. Returns the matching books, most similar first'
+        return [self.getBook(recordId) for recordId in self.useIndex("text").fuzzySearch(query, threshold, limit)]
+
+    def statistics(self):
+        'Returns the CollectionStats of the library, counting every book in one pass the first time it is used'
+        return self.useIndex("stats")
+
+    def insertBook(self, book):
+        'takes a book and adds it to the library, replacing any book with the same record id. The book is placed into every cached order by binary search. Returns nothing'
+        if book.recordId in self._index:
+            self.removeBook(book.recordId)
+        slot = len(self._slots)
+        self._index[book.recordId] = slot
+        self._slots.append(book)
+        if self._liveOrder is not None:
+            self._liveOrder.append(slot)
+        for key, order in self._orders.items():
+            sortModules.insertIntoOrder(self._slots, order, slot, key)
+        for index in self._indexes.values():
+            index.add(book)
+
+    def insertBooks(self, books):
+        'takes a list of books and adds them all to the library. Returns nothing'
+        for book in books:
+            self.insertBook(book)
+
+    def removeBook(self, recordId):
+        'takes a record id and removes that book from the library by leaving a tombstone in its slot and taking the slot out of every cached order by binary search. The slot array is compacted once tombstones fill COMPACT_FRACTION of it. Returns the removed book (a BookRef if a LazyLibrary never read it)'
+        slot = self._index.pop(recordId)
+        book = self._slots[slot]
+        for key, order in self._orders.items(): #before the tombstone goes in, as the search compares the book's key
+            sortModules.removeFromOrder(self._slots, order, slot, key)
+        self._slots[slot] = None
+        self._tombstones += 1
+        if self._liveOrder is not None:
+            del self._liveOrder[bisect_left(self._liveOrder, slot)]
+        for index in self._indexes.values():
+            index.remove(book)
+        if self._tombstones > COMPACT_FRACTION * len(self._slots):
+            self._compact()
+        return book
+
+    def removeBooks(self, recordIds):
+        'takes a list of record ids and removes all of those books from the library. Returns nothing'
+        for recordId in recordIds:
+            self.removeBook(recordId)
+
+    def useOrder(self, key):
+        'takes a sort key name from sortModules.SORT_KEYS and makes bookList read in that order, building the order the first time it is used. Returns nothing'
+        self._order(key)
+        self._activeOrder = key
+
+    def query(self, yearPub = None, pageLength = None, dateAdded = None, author = None):
+        'takes (lowest, highest) ranges for any of yearPub, pageLength and dateAdded, where both ends are included and None leaves an end open, and optionally an author name to match exactly. Returns the books matching all of them in bookList order'
+        predicates = {field: bounds for field, bounds in (("yearPub", yearPub), ("pageLength", pageLength), ("dateAdded", dateAdded))
+                      if bounds is not None}
+        if author is not None:
+            predicates["author"] = (author, author)
+        if not predicates:
+            return list(self.bookList)
+        orders = {field: self._order(sortModules.RANGE_ORDERS[field]) for field in predicates}
+        slots = self._slots
+        ranges = {field: sortModules.rangeInOrder(slots, orders[field], field, low, high) for field, (low, high) in predicates.items()}
+        field = min(ranges, key = lambda field: ranges[field][1] - ranges[field][0]) #walk the narrowest range, check the rest
+        start, end = ranges[field]
+        others = [(attrgetter(other), low, high) for other, (low, high) in predicates.items() if other != field]
+        matched = [slot for slot in orders[field][start:end]
+                   if all((low is None or getValue(slots[slot]) >= low) and (high is None or getValue(slots[slot]) <= high)
+                          for getValue, low, high in others)]
+        if self._activeOrder is None:
+            matched.sort()
+        else:
+            keyFunction = sortModules.SORT_KEYS[self._activeOrder]
+            matched.sort(key = lambda slot: keyFunction(slots[slot]))
+        return [self._book(slot) for slot in matched]
+
+    def _order(self, key):
+        'takes a sort key name from sortModules.SORT_KEYS. Returns the cached order for that key, building it the first time it is used'
+        if key not in self._orders:
+            self._orders[key] = sortModules.buildOrder(self._slots, key)
+        return self._orders[key]
+
+    def _view(self):
+        'Returns the slot array and the live slots in the order bookList reads them (None when reading every slot in slot order)'
+        if self._activeOrder is not None:
+            return self._slots, self._orders[self._activeOrder]
+        if self._tombstones and self._liveOrder is None: #built once, then kept up to date until the next compaction
+            self._liveOrder = [slot for slot, book in enumerate(self._slots) if book is not None]
+        return self._slots, self._liveOrder if self._tombstones else None
+
+    def _compact(self):
+        'drops the tombstones from the slot array in one pass, renumbering the record id index and the cached orders (which only hold live slots) to match. Returns nothing'
+        newSlot = [-1] * len(self._slots) #old slot -> new slot, -1 for tombstones
+        slots = []
+        for slot, book in enumerate(self._slots):
+            if book is not None:
+                newSlot[slot] = len(slots)
+                slots.append(book)
+        for key in self._orders:
+            self._orders[key] = [newSlot[slot] for slot in self._orders[key]]
+        self._slots = slots
+        self._index = {recordId: newSlot[slot] for recordId, slot in self._index.items()}
+        self._tombstones = 0
+        self._liveOrder = None
+
+    def _book(self, slot):
+        'takes a live slot number. Returns the book in that slot'
+        return self._slots[slot]
+
+class BookList(Sequence):
+    'read-only sequence view over the books of a library in its active order, leaving out the tombstones of removed books'
+    __slots__ = ("_library",)
+
+    def __init__(self, library):
+        self._library = library
+
+    def __len__(self):
+        return len(self._library)
+
+    def __getitem__(self, index):
+        library = self._library
+        slots, order = library._view()
+        if order is None:
+            order = range(len(slots))
+        if isinstance(index, slice):
+            return [library._book(slot) for slot in order[index]]
+        return library._book(order[index])
+
+    def __iter__(self):
+        library = self._library
+        slots, order = library._view()
+        return map(library._book, range(len(slots)) if order is None else order)
+
+    def __eq__(self, other):
+        if not isinstance(other, (BookList, list, tuple)):
+            return NotImplemented
+        return list(self) == list(other)
+
+    def __repr__(self):
+        return "BookList(%r)" % list(self)
+
+class LazyLibrary(Library):
+    'a library of .book files that only lists the files up front and reads each book when it is first accessed, keeping the most recently read books in an LRU cache'
+    def __init__(self,path,bookFiles,layout = "flat",workers = 1,useCache = True):
+        refs = []
+        for name, bookPath in bookFiles:
+            recordId = Path(name).stem
+            try:
+                refs.append(BookRef(bookPath, recordId, dateFromRecordId(recordId)))
+            except ValueError: #the file is not named by a record id, so its date added has to be read now
+                book = _readBookFile(bookPath)
+                if book is not None:
+                    refs.append(book)
+        super().__init__(path, refs, layout)
+        self.workers = workers
+        self.useCache = useCache #whether readAll takes unchanged books from the parsed-collection cache
+        self._decoded = OrderedDict() #.book path -> book, the LRU cache of read books
+
+    def _order(self, key):
+        'takes a sort key name from sortModules.SORT_KEYS. Returns the order as Library._order does. Every order but the date order needs every book read first'
+        if key != "date" and key not in self._orders: #the date order only needs the record id and date added, which every BookRef already has
+            self.readAll()
+        return super()._order(key)
+
+    def useIndex(self, name):
+        'takes the name of an index from INDEX_TYPES. Reads every book first, then returns the index as Library.useIndex does'
+        if name not in self._indexes:
+            self.readAll()
+        return super().useIndex(name)
+
+    def readAll(self):
+        'reads every book not read yet and keeps them all, after which the library behaves like a fully loaded one. Books whose .book file still has the mtime and size in the parsed-collection cache are taken from the cache, the rest are read on the library\'s worker threads and cached for next time. Returns nothing'
+        slots = self._slots
+        unread = [slot for slot, entry in enumerate(slots) if isinstance(entry, BookRef)]
+        if not unread:
+            return
+        path = Path(self.path)
+        cache = _readCache(path) if self.useCache else {}
+        names = [_cacheName(slots[slot].path, self.layout) for slot in unread]
+        stats = _statBookFiles([slots[slot].path for slot in unread], self.workers)
+        newCache = {}
+        changed = [] #positions in unread of the files that have to be read
+        for position, (name, stat) in enumerate(zip(names, stats)):
+            hit = cache.get(name)
+            if stat is not None and hit is not None and hit[0] == stat.st_mtime_ns and hit[1] == stat.st_size:
+                slots[unread[position]] = Book(*hit[2:])
+                newCache[name] = hit
+            else:
+                changed.append(position)
+        books = _readBookFiles([slots[unread[position]].path for position in changed], self.workers)
+        for position, book in zip(changed, books):
+            stat = stats[position]
+            if book is not None and stat is not None:
+                newCache[names[position]] = [stat.st_mtime_ns, stat.st_size, *book]
+            slots[unread[position]] = book if book is not None else _unreadableBook(slots[unread[position]])
+        if self.useCache and (changed or len(newCache) != len(cache)): #only rewrite the cache when a file was added, changed or removed
+            _writeCache(path, newCache)
+        self._decoded.clear()
+
+    def _book(self, slot):
+        'takes a live slot number. Returns the book in that slot, reading its .book file if it is not in the LRU cache'
+        entry = self._slots[slot]
+        if not isinstance(entry, BookRef):
+            return entry
+        book = self._decoded.get(entry.path)
+        if book is not None:
+            self._decoded.move_to_end(entry.path)
+            return book
+        book = _readBookFile(entry.path) or _unreadableBook(entry) #removed or damaged outside the program
+        self._decoded[entry.path] = book
+        if len(self._decoded) > LAZY_CACHE_BOOKS:
+            self._decoded.popitem(last = False)
+        return book
+
+class BookRef:
+    'a .book file of a LazyLibrary that has not been read yet. Carries what its file name gives away: the record id and date added'
+    __slots__ = ("path", "recordId", "dateAdded")
+
+    def __init__(self, path, recordId, dateAdded):
+        self.path = path
+        self.recordId = recordId
+        self.dateAdded = dateAdded
+
+def _unreadableBook(ref):
+    'takes the BookRef of a .book file that could not be parsed. Returns a placeholder book so the collection can still be browsed'
+    return Book("(unreadable book file)", "", 0, 0, ref.dateAdded, ref.recordId)
+
+class Book:
+    'a single book. yearPub and pageLength are ints and dateAdded is a float, each converted once when the book is created'
+    __slots__ = ("title", "author", "yearPub", "pageLength", "dateAdded", "recordId") #no per-book __dict__, only the fields are stored
+
+    def __init__(self,title,author,yearPub,pageLength,dateAdded,recordId = None):
+        self.title = title
+        self.author = author
+        self.yearPub = int(yearPub)
+        self.pageLength = int(pageLength)
+        self.dateAdded = float(dateAdded)
+        self.recordId = str(self.dateAdded) if recordId is None else recordId #the name of the book's file without the .book extension
+
+    def __iter__(self):
+        return iter((self.title, self.author, self.yearPub, self.pageLength, self.dateAdded, self.recordId))
+
+    def __eq__(self, other):
+        if not isinstance(other, Book):
+            return NotImplemented
+        return tuple(self) == tuple(other)
+
+    def __hash__(self):
+        return hash(tuple(self))
+
+    def __repr__(self):
+        return "Book(title=%r, author=%r, yearPub=%r, pageLength=%r, dateAdded=%r, recordId=%r)" % tuple(self)
+
+### SQLite collections
+###
+### An SQLite collection keeps its books in collection.sqlite3 instead of .book files, with an index for every sort
+### order. Nothing is loaded up front: bookList reads one page of rows at a time in the active sort order, and
+### lookups, sorts and deletes are indexed queries, so a collection of millions of books can be paged through.
+
+SQLITE_FILE = "collection.sqlite3"
+_SQLITE_PAGE_ROWS = 256 #rows bookList fetches per query
+_SQLITE_CACHED_PAGES = 8 #pages bookList keeps, enough to step back and forth around the current book
+_SQLITE_COLUMNS = "title, author, yearPub, pageLength, dateAdded, recordId, rowid"
+_SQLITE_ORDERS = {None: ("rowid",), #the order books were added in, like the slot order of Library
+                  "title": ("title", "recordId"),
+                  "author": ("author", "title", "recordId"),
+                  "year": ("yearPub", "title", "recordId"),
+                  "pages": ("pageLength", "title", "recordId"),
+                  "date": ("dateAdded", "recordId")}
+_SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS books (recordId TEXT NOT NULL UNIQUE, title TEXT NOT NULL, author TEXT NOT NULL,
+                                  yearPub INTEGER NOT NULL, pageLength INTEGER NOT NULL, dateAdded REAL NOT NULL);
+CREATE INDEX IF NOT EXISTS booksByTitle ON books (title, recordId);
+CREATE INDEX IF NOT EXISTS booksByAuthor ON books (author, title, recordId);
+CREATE INDEX IF NOT EXISTS booksByYear ON books (yearPub, title, recordId);
+CREATE INDEX IF NOT EXISTS booksByPages ON books (pageLength, title, recordId);
+CREATE INDEX IF NOT EXISTS booksByDate ON books (dateAdded, recordId);
+"""
+
+class SQLiteLibrary(Library):
+    'a collection stored in an SQLite database. Books stay on disk and every operation of Library runs as an indexed query'
+    def __init__(self,path,databasePath = None):
+        self.path = path
+        self.layout = "sqlite"
+        self._connection = sqlite3.connect(databasePath or os.path.join(path, SQLITE_FILE))
+        self._connection.executescript(_SQLITE_SCHEMA)
+        self._activeOrder = None
+        self._indexes = {}
+        self._forgetPages()
+
+    @property
+    def bookList(self):
+        'the books of the library in their current order'
+        return SQLiteBookList(self)
+
+    @bookList.setter
+    def bookList(self, books):
+        books = list(books) #read everything first, the books may come from this same database
+        with self._connection:
+            self._connection.execute("DELETE FROM books")
+        for index in self._indexes.values():
+            index.build([])
+        self.insertBooks(books)
+
+    def __len__(self):
+        if self._count is None:
+            self._count = self._connection.execute("SELECT COUNT(*) FROM books").fetchone()[0]
+        return self._count
+
+    def __contains__(self, recordId):
+        return self._connection.execute("SELECT 1 FROM books WHERE recordId = ?", (recordId,)).fetchone() is not None
+
+    def recordIds(self):
+        return [row[0] for row in self._connection.execute("SELECT recordId FROM books")]
+
+    def getBook(self, recordId):
+        'takes a record id. Returns the book with that id, or None if the library does not hold it'
+        row = self._connection.execute("SELECT " + _SQLITE_COLUMNS + " FROM books WHERE recordId = ?", (recordId,)).fetchone()
+        return None if row is None else Book(*row[:6])
+
+    def positionOf(self, recordId):
+        'takes a record id. Returns the position of that book in bookList, counted through the index of the active order, or raises KeyError if the library does not hold it'
+        columns = ", ".join(_SQLITE_ORDERS[self._activeOrder])
+        row = self._connection.execute("SELECT " + columns + " FROM books WHERE recordId = ?", (recordId,)).fetchone()
+        if row is None:
+            raise KeyError(recordId)
+        return self._connection.execute("SELECT COUNT(*) FROM books WHERE (" + columns + ") < (" + ", ".join("?" * len(row)) + ")",
+                                        row).fetchone()[0]
+
+    def insertBook(self, book):
+        'takes a book and adds it to the library, replacing any book with the same record id. Returns nothing'
+        self.insertBooks([book])
+
+    def insertBooks(self, books):
+        'takes a list of books and adds them all to the library in one transaction. Returns nothing'
+        if self._indexes: #replaced books have to leave the indexes before their new versions go in
+            books = list(books)
+            replaced = [self.getBook(book.recordId) for book in books]
+            for index in self._indexes.values():
+                for book in replaced:
+                    if book is not None:
+                        index.remove(book)
+                for book in books:
+                    index.add(book)
+        with self._connection:
+            self._connection.executemany("INSERT OR REPLACE INTO books (title, author, yearPub, pageLength, dateAdded, recordId) "
+                                         "VALUES (?, ?, ?, ?, ?, ?)", (tuple(book) for book in books))
+        self._forgetPages()
+
+    def removeBook(self, recordId):
+        'takes a record id and removes that book from the library. Returns the removed book'
+        book = self.getBook(recordId)
+        if book is None:
+            raise KeyError(recordId)
+        self.removeBooks([recordId])
+        return book
+
+    def removeBooks(self, recordIds):
+        'takes a list of record ids and removes all of those books from the library in one transaction. Returns nothing'
+        if self._indexes:
+            recordIds = list(recordIds)
+            removed = [book for book in map(self.getBook, recordIds) if book is not None]
+            for index in self._indexes.values():
+                for book in removed:
+                    index.remove(book)
+        with self._connection:
+            self._connection.executemany("DELETE FROM books WHERE recordId = ?", ((recordId,) for recordId in recordIds))
+        self._forgetPages()
+
+    def useOrder(self, key):
+        'takes a sort key name from sortModules.SORT_KEYS and makes bookList read in that order. Returns nothing'
+        if key not in _SQLITE_ORDERS:
+            raise KeyError(key)
+        self._activeOrder = key
+        self._forgetPages()
+
+    def query(self, yearPub = None, pageLength = None, dateAdded = None, author = None):
+        'takes the same ranges and author as Library.query. Returns the books matching all of them in bookList order, found through the column indexes'
+        where = []
+        values = []
+        for column, bounds in (("yearPub", yearPub), ("pageLength", pageLength), ("dateAdded", dateAdded)):
+            if bounds is None:
+                continue
+            low, high = bounds
+            if low is not None:
+                where.append(column + " >= ?")
+                values.append(low)
+            if high is not None:
+                where.append(column + " <= ?")
+                values.append(high)
+        if author is not None:
+            where.append("author = ?")
+            values.append(author)
+        rows = self._connection.execute("SELECT " + _SQLITE_COLUMNS + " FROM books" + (" WHERE " + " AND ".join(where) if where else "") +
+                                        " ORDER BY " + ", ".join(_SQLITE_ORDERS[self._activeOrder]), values)
+        return [Book(*row[:6]) for row in rows]
+
+    def close(self):
+        'closes the database connection. Returns nothing'
+        self._connection.close()
+
+    def _bookAt(self, index):
+        'takes a position in the active order. Returns the book at that position, fetching its page of rows when it is not cached'
+        page, row = divmod(index, _SQLITE_PAGE_ROWS)
+        if page not in self._pages:
+            self._pages[page] = self._fetchPage(page)
+            if len(self._pages) > _SQLITE_CACHED_PAGES:
+                self._pages.popitem(last = False)
+        self._pages.move_to_end(page)
+        return self._pages[page][0][row]
+
+    def _fetchPage(self, page):
+        'takes a page number. Returns the books on that page and the sort key values of its last row'
+        columns = _SQLITE_ORDERS[self._activeOrder]
+        orderBy = " ORDER BY " + ", ".join(columns) + " LIMIT " + str(_SQLITE_PAGE_ROWS)
+        previous = self._pages.get(page - 1)
+        if previous is not None: #the page right before is cached, so continue from its last row through the index
+            where = " WHERE (" + ", ".join(columns) + ") > (" + ", ".join("?" * len(columns)) + ")"
+            rows = self._connection.execute("SELECT " + _SQLITE_COLUMNS + " FROM books" + where + orderBy, previous[1]).fetchall()
+        else:
+            rows = self._connection.execute("SELECT " + _SQLITE_COLUMNS + " FROM books" + orderBy + " OFFSET ?",
+                                            (page * _SQLITE_PAGE_ROWS,)).fetchall()
+        names = _SQLITE_COLUMNS.split(", ")
+        lastKey = tuple(rows[-1][names.index(column)] for column in columns) if rows else ()
+        return [Book(*row[:6]) for row in rows], lastKey
+
+    def _forgetPages(self):
+        'drops the cached pages and count after the books or their order changed. Returns nothing'
+        self._pages = OrderedDict() #page number -> (books, sort key values of the last book)
+        self._count = None
+
+class SQLiteBookList(Sequence):
+    'read-only sequence view over the books of an SQLiteLibrary in its active order, read from the database a page at a time'
+    __slots__ = ("_library",)
+
+    def __init__(self, library):
+        self._library = library
+
+    def __len__(self):
+        return len(self._library)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._library._bookAt(position) for position in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("book index out of range")
+        return self._library._bookAt(index)
+
+    def __eq__(self, other):
+        if not isinstance(other, (BookList, SQLiteBookList, list, tuple)):
+            return NotImplemented
+        return list(self) == list(other)
+
+    def __repr__(self):
+        return "SQLiteBookList(%d books)" % len(self)
+
+### Packed collection format
+###
+### A packed collection stores every book in one append-only segment file (collection.bookpack).
+### Each record is a fixed size header followed by the utf-8 encoded record id, title and author.
+### Deleting a book appends a delete record (a tombstone) instead of rewriting the segment, so the whole
+### collection is loaded with a single sequential read and every write is a single append.
+
+PACK_SEGMENT = "collection.bookpack"
+_PACK_MAGIC = b"LCMPACK1"
+_OP_ADD = 1
+_OP_DELETE = 2
+_RECORD_HEADER = struct.Struct("<BHIIiid") #op, id length, title length, author length, yearPub, pageLength, dateAdded
+_INT32_RANGE = range(-2 ** 31, 2 ** 31) #yearPub and pageLength are stored as 32 bit ints in packed records and .bookcol files
+
+### Read-only packed collections
+###
+### loadFile(..., readOnly=True) memory maps a packed segment instead of parsing it. Each book is then a BookRecord,
+### a view holding only the mapping and the offset of its record, which decodes a field from the mapped bytes when
+### that field is read. The mapping is backed by the segment file itself, so every process opening the same
+### collection shares one copy of it in the OS page cache instead of holding its own parsed books.
+
+class MappedLibrary(Library):
+    'a packed collection opened read-only. Its books are BookRecord views into the memory mapped segment file, and anything that would change the collection raises ReadOnlyError'
+    readOnly = True
+
+    def __init__(self,path,segmentPath):
+        self.path = path
+        self.layout = "packed"
+        with open(segmentPath, "rb") as segment: #the mapping stays valid after the file is closed
+            if os.fstat(segment.fileno()).st_size < len(_PACK_MAGIC):
+                raise BadPathError("The collection's packed segment file is damaged")
+            self._data = mmap.mmap(segment.fileno(), 0, access = mmap.ACCESS_READ)
+        if self._data[:len(_PACK_MAGIC)] != _PACK_MAGIC:
+            self._data.close()
+            raise BadPathError("The collection's packed segment file is damaged")
+        offsets = array("Q")
+        deletedAt = {} #record id -> offset of its last delete record
+        for offset, op, recordId in _scanRecords(self._data):
+            if op == _OP_ADD:
+                offsets.append(offset)
+            else:
+                deletedAt[str(recordId, "utf-8")] = offset
+        if deletedAt: #only then are the add records looked at again, to drop the books deleted after them
+            offsets = array("Q", (offset for offset in offsets
+                                  if deletedAt.get(BookRecord(self._data, offset).recordId, -1) < offset))
+        self._slots = _RecordViews(self._data, offsets)
+        self._indexes = {}
+        self._tombstones = 0
+        self._liveOrder = None
+        self._orders = {}
+        self._activeOrder = None
+        self._recordIndex = None #record id -> slot, only built once a book is looked up by record id
+
+    @property
+    def bookList(self):
+        'the books of the library in their current order'
+        return BookList(self)
+
+    @bookList.setter
+    def bookList(self, books):
+        raise ReadOnlyError("The collection was opened read-only")
+
+    @property
+    def _index(self):
+        if self._recordIndex is None:
+            self._recordIndex = {record.recordId: slot for slot, record in enumerate(self._slots)}
+        return self._recordIndex
+
+    def insertBook(self, book):
+        raise ReadOnlyError("The collection was opened read-only")
+
+    def removeBook(self, recordId):
+        raise ReadOnlyError("The collection was opened read-only")
+
+    def close(self):
+        'unmaps the segment file. BookRecords taken from the library can no longer be read afterwards. Returns nothing'
+        self._data.close()
+
+class _RecordViews(Sequence):
+    'the slot array of a MappedLibrary: the offsets of its add records, handing out a BookRecord for each slot'
+    __slots__ = ("_data", "_offsets")
+
+    def __init__(self, data, offsets):
+        self._data = data
+        self._offsets = offsets #8 bytes per book
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def __getitem__(self, slot):
+        return BookRecord(self._data, self._offsets[slot])
+
+class BookRecord:
+    'a read-only view of one book in a memory mapped segment file. Only the mapping and the record offset are stored, each field is decoded from the mapped bytes when it is read'
+    __slots__ = ("_data", "_offset")
+
+    def __init__(self, data, offset):
+        self._data = data
+        self._offset = offset
+
+    def _string(self, field):
+        'takes 0 for the record id, 1 for the title or 2 for the author. Returns that field decoded from the mapping'
+        lengths = _RECORD_HEADER.unpack_from(self._data, self._offset)[1:4]
+        start = self._offset + _RECORD_HEADER.size + sum(lengths[:field])
+        return str(self._data[start:start + lengths[field]], "utf-8")
+
+    @property
+    def recordId(self):
+        return self._string(0)
+
+    @property
+    def title(self):
+        return self._string(1)
+
+    @property
+    def author(self):
+        return self._string(2)
 
-Book = namedtuple("Book", "title author yearPub pageLength dateAdded")
+    @property
+    def yearPub(self):
+        return _RECORD_HEADER.unpack_from(self._data, self._offset)[4]
+
+    @property
+    def pageLength(self):
+        return _RECORD_HEADER.unpack_from(self._data, self._offset)[5]
+
+    @property
+    def dateAdded(self):
+        return _RECORD_HEADER.unpack_from(self._data, self._offset)[6]
+
+    def toBook(self):
+        'Returns a Book holding a copy of every field, which stays usable after the library is closed'
+        return Book(*self)
+
+    def __iter__(self):
+        op, idLength, titleLength, authorLength, yearPub, pageLength, dateAdded = _RECORD_HEADER.unpack_from(self._data, self._offset)
+        idStart = self._offset + _RECORD_HEADER.size
+        titleStart = idStart + idLength
+        authorStart = titleStart + titleLength
+        return iter((str(self._data[titleStart:authorStart], "utf-8"),
+                     str(self._data[authorStart:authorStart + authorLength], "utf-8"),
+                     yearPub, pageLength, dateAdded, str(self._data[idStart:titleStart], "utf-8")))
+
+    def __eq__(self, other):
+        if not isinstance(other, (Book, BookRecord)):
+            return NotImplemented
+        return tuple(self) == tuple(other)
+
+    def __hash__(self):
+        return hash(tuple(self))
+
+    def __repr__(self):
+        return "BookRecord(title=%r, author=%r, yearPub=%r, pageLength=%r, dateAdded=%r, recordId=%r)" % tuple(self)
+
+### Parsed-collection cache
+###
+### Flat collections keep a sidecar cache file holding every parsed book keyed by its file name, together with
+### the file's modification time and size. Loading only reads the .book files that are new or whose mtime or size
+### changed since the cache was written, so reopening an unchanged collection costs one directory listing.
+
+CACHE_FILE = ".collection.cache"
+_CACHE_VERSION = 3
+
+### Sharded collections
+###
+### A sharded collection spreads its .book files across SHARD_COUNT subdirectories named by two hex digits of a hash
+### of the record id (e.g. 3f/<record id>.book), so no single directory grows past a few thousand entries.
+### The marker file SHARD_MARKER in the collection directory tells loadFile to look in the subdirectories.
+
+SHARD_MARKER = ".collection.sharded"
+SHARD_COUNT = 256
+
+LAZY_CACHE_BOOKS = 1024 #books a LazyLibrary keeps after reading them
+
+INDEX_TYPES = {"text": SearchIndex.TextIndex, "stats": CollectionStats.CollectionStats} #indexes a library can keep up to date, see Library.useIndex
+
+LOAD_WORKERS = 8 #number of threads the GUI uses to read .book files when loading a collection
+
+IMPORT_BATCH_SIZE = 1000 #number of books importBooks validates and writes at a time
+
+### Exported columnar files
+###
+### A columnar export (.bookcol) is a magic string followed by row groups of up to EXPORT_GROUP_ROWS books.
+### Each row group starts with its row count and byte length, then holds the yearPub and pageLength columns
+### as little-endian int32 arrays, the dateAdded column as a float64 array, and the title, author and record id
+### columns as uint32 end offsets followed by their utf-8 bytes. A row group with a row count of 0 ends the file.
+
+EXPORT_GROUP_ROWS = 65536 #books per columnar row group and per buffered csv/jsonl write
+_EXPORT_BUFFER = 1 << 20 #bytes of write buffering for exported files
+_COLUMNAR_MAGIC = b"LCMCOL01"
+_GROUP_HEADER = struct.Struct("<IQ") #row count, byte length of the rest of the group
+
+### Record ids
+###
+### New books are named by a record id made of the microsecond timestamp they were added at, a counter and a node id:
+### 0001697040000123456-0000-3f2a9c0e41b7. The counter separates books added within the same microsecond and the node
+### id, random per process, separates processes adding to the same collection. Ids from one process only ever
+### increase, the date added is the timestamp part, and ids sort in the order the books were added.
+### Books added before record ids existed are named by their date added (e.g. 1608163200.123456) and keep that name.
+
+class RecordIdGenerator:
+    'hands out unique, increasing record ids. Safe to share between threads'
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._lastMicros = 0
+        self._counter = 0
+        self.resetNode()
+
+    def resetNode(self):
+        'picks a new random node id, which forked processes must do so they do not share their parent\'s. Returns nothing'
+        self.node = os.urandom(6).hex()
+
+    def next(self):
+        'Returns a new record id'
+        with self._lock:
+            micros = time.time_ns() // 1000
+            if micros <= self._lastMicros: #same microsecond, or the clock went backwards: stay on the last timestamp and count
+                micros = self._lastMicros
+                self._counter += 1
+                if self._counter > 0xFFFF: #the counter is full, borrow the next microsecond
+                    micros += 1
+                    self._counter = 0
+            else:
+                self._counter = 0
+            self._lastMicros = micros
+            return "%019d-%04x-%s" % (micros, self._counter, self.node)
+
+_recordIds = RecordIdGenerator()
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_recordIds.resetNode)
+
+def newRecordId():
+    'Returns a new, unique record id for a book'
+    return _recordIds.next()
+
+def dateFromRecordId(recordId):
+    'takes a record id. Returns the date added it encodes as seconds since the epoch'
+    timestamp, separator, rest = recordId.partition("-")
+    if separator: #timestamp-counter-node ids hold the microseconds the book was added at
+        return int(timestamp) / 1_000_000
+    return float(recordId) #older books are named by their date added
+
+### Write-ahead journal
+###
+### With loadFile(..., journal=True), books added to or deleted from a flat or sharded collection are not written
+### straight to .book files. Each change is encoded like a packed record and collected into a group. A group is
+### appended to the collection's journal (JOURNAL_FILE) as one checksummed frame, fsynced and only then applied to the
+### .book files; add and delete return once the group holding their changes is applied, so a change they have
+### returned from survives a crash. A change made while no group is being committed is committed straight away, and
+### changes made by other threads while a group is being fsynced are collected into the next group, which shares one
+### fsync. When the journal grows past JOURNAL_CHECKPOINT_BYTES the files written since the last checkpoint
+### are fsynced and the journal is emptied. Loading a collection replays the groups a crash left in the journal;
+### applying a change twice is harmless, and a group cut short by a crash fails its checksum and is dropped whole.
+
+JOURNAL_FILE = ".collection.journal"
+JOURNAL_CHECKPOINT_BYTES = 1 << 20
+_JOURNAL_MAGIC = b"LCMJRNL1"
+_JOURNAL_FRAME = struct.Struct("<II") #byte length and crc32 of the group's records
+_journals = {} #absolute collection path -> open Journal, shared by every library loaded from that collection
+_journalsLock = threading.Lock()
+
+class _JournalGroup:
+    'the changes committed to a journal by one fsync'
+    def __init__(self):
+        self.changes = [] #(op, record id, book) of every change in the group
+        self.done = False #whether the group has been committed, or failed to be
+        self.error = None #the OSError committing the group failed with
+
+class Journal:
+    'the write-ahead journal of a flat or sharded collection. Safe to share between threads'
+    def __init__(self, directory, layout = "flat"):
+        self.path = os.path.join(directory, JOURNAL_FILE)
+        self.commits = 0 #groups fsynced so far, changes / commits tells how well changes are being grouped
+        self._target = Library(directory, layout = layout) #only used to find the .book file paths
+        self._lock = threading.Lock()
+        self._committed = threading.Condition(self._lock) #notified whenever a group has been committed
+        self._group = _JournalGroup() #the changes waiting for the next commit
+        self._pending = {} #record id -> op of its latest change waiting for the next commit
+        self._committing = None #record id -> op of every change in the group being committed, None between commits
+        self._unsynced = set() #.book files written since the last checkpoint
+        replayed = self._replay()
+        self._file = open(self.path, "ab")
+        if self._file.tell() == 0:
+            self._file.write(_JOURNAL_MAGIC)
+            self._syncJournal()
+        elif replayed:
+            self._checkpoint()
+
+    def add(self, books):
+        'takes a list of new books. Journals writing their .book files. Returns once they are written and journaled'
+        self._append([(_OP_ADD, book.recordId, book) for book in books])
+
+    def delete(self, recordIds):
+        'takes a list of record ids. Journals removing their .book files. Returns once they are removed and journaled'
+        self._append([(_OP_DELETE, recordId, None) for recordId in recordIds])
+
+    def exists(self, recordId):
+        'takes a record id. Returns whether its .book file exists once every journaled change is applied'
+        with self._lock:
+            op = self._pending.get(recordId)
+            if op is None and self._committing is not None:
+                op = self._committing.get(recordId)
+        if op is None:
+            return os.path.exists(_bookFilePath(self._target, recordId))
+        return op == _OP_ADD
+
+    def flush(self):
+        'commits and applies the changes collected so far. Returns nothing'
+        with self._lock:
+            self._commit()
+
+    def close(self):
+        'commits every change, checkpoints and closes the journal. Returns nothing'
+        with self._lock:
+            self._commit()
+            self._checkpoint()
+            self._file.close()
+        with _journalsLock:
+            if _journals.get(os.path.abspath(self._target.path)) is self:
+                del _journals[os.path.abspath(self._target.path)]
+
+    def _append(self, changes):
+        'takes a list of (op, record id, book) changes. Adds them to the current group and waits until that group is committed. Returns nothing'
+        with self._lock:
+            group = self._group
+            for op, recordId, book in changes:
+                group.changes.append((op, recordId, book))
+                self._pending[recordId] = op
+            while not group.done:
+                if self._committing is None: #nobody is committing, so this thread commits the group itself
+                    self._commit()
+                else: #the group is committed once the one being fsynced is done
+                    self._committed.wait()
+            if group.error is not None:
+                raise group.error
+
+    def _commit(self):
+        'called holding the lock. Writes the current group to the journal as one frame, fsyncs it and applies it to the .book files, letting other threads collect the next group meanwhile. Returns nothing'
+        while self._committing is not None:
+            self._committed.wait()
+        group, self._group = self._group, _JournalGroup()
+        if not group.changes:
+            group.done = True
+            return
+        self._committing, self._pending = self._pending, {}
+        self._lock.release()
+        try:
+            body = b"".join(_encodeRecord(op, recordId, book) for op, recordId, book in group.changes)
+            self._file.write(_JOURNAL_FRAME.pack(len(body), zlib.crc32(body)) + body)
+            self._syncJournal()
+            self.commits += 1
+            self._apply(group.changes)
+            if self._file.tell() >= JOURNAL_CHECKPOINT_BYTES:
+                self._checkpoint()
+        except OSError as error: #every thread waiting on the group raises it
+            group.error = error
+        finally:
+            self._lock.acquire()
+            self._committing = None
+            group.done = True
+            self._committed.notify_all()
+        if group.error is not None:
+            raise group.error
+
+    def _apply(self, changes):
+        'takes (op, record id, book) changes. Brings the .book files to the state they leave behind, in one write or remove per record id. Returns nothing'
+        latest = {}
+        for op, recordId, book in changes:
+            latest.pop(recordId, None) #only the last change of a record id matters, and it keeps its position
+            latest[recordId] = (op, book)
+        for recordId, (op, book) in latest.items():
+            bookPath = _bookFilePath(self._target, recordId)
+            self._unsynced.add(os.path.dirname(bookPath)) #the directory entry has to be synced as well as the file
+            if op == _OP_ADD:
+                self._unsynced.update(_writeBookFiles(self._target, [book]))
+            else:
+                try:
+                    os.remove(bookPath)
+                except FileNotFoundError: #already removed by an earlier run of the same change
+                    pass
+                self._unsynced.discard(bookPath)
+
+    def _checkpoint(self):
+        'fsyncs every .book file and directory changed since the last checkpoint, then empties the journal. Returns nothing'
+        for changedPath in self._unsynced:
+            try:
+                if os.path.isdir(changedPath):
+                    if os.name == "posix": #directories can only be opened and synced on posix systems
+                        directory = os.open(changedPath, os.O_RDONLY)
+                        try:
+                            os.fsync(directory)
+                        finally:
+                            os.close(directory)
+                else: #opened without O_CREAT, so a file removed since it was written is not brought back empty
+                    changed = os.open(changedPath, os.O_RDONLY if os.name == "posix" else os.O_RDWR)
+                    try:
+                        os.fsync(changed)
+                    finally:
+                        os.close(changed)
+            except FileNotFoundError:
+                pass
+        self._unsynced = set()
+        self._file.truncate(len(_JOURNAL_MAGIC))
+        self._syncJournal()
+
+    def _syncJournal(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def _replay(self):
+        'applies every complete group in the journal file, which a crash may have left unapplied. Returns whether there was anything to apply'
+        try:
+            with open(self.path, "rb") as journalFile:
+                data = journalFile.read()
+        except FileNotFoundError:
+            return False
+        if len(data) < len(_JOURNAL_MAGIC) and _JOURNAL_MAGIC.startswith(data): #a crash came before the new journal's header was fsynced
+            with open(self.path, "r+b") as journalFile:
+                journalFile.truncate(0) #the header is written again when the journal is opened
+            return False
+        if not data.startswith(_JOURNAL_MAGIC):
+            raise BadPathError("The collection's journal file is damaged")
+        offset = len(_JOURNAL_MAGIC)
+        changes = []
+        while offset + _JOURNAL_FRAME.size <= len(data):
+            length, checksum = _JOURNAL_FRAME.unpack_from(data, offset)
+            body = data[offset + _JOURNAL_FRAME.size:offset + _JOURNAL_FRAME.size + length]
+            if len(body) < length or zlib.crc32(body) != checksum: #the last group was cut short by a crash
+                break
+            changes.extend((op, recordId, book) for start, end, op, recordId, book in _decodeRecords(body, 0))
+            offset += _JOURNAL_FRAME.size + length
+        if offset < len(data): #the partial group never reached its fsync, so nothing relied on it
+            with open(self.path, "r+b") as journalFile:
+                journalFile.truncate(offset)
+        self._apply(changes)
+        return bool(changes)
+
+def _openJournal(directory, layout):
+    'takes a flat or sharded collection directory and its layout. Returns the open journal of that collection, replaying or flushing it first so its .book files are up to date'
+    key = os.path.abspath(directory)
+    with _journalsLock:
+        journal = _journals.get(key)
+        if journal is None:
+            journal = _journals[key] = Journal(directory, layout)
+            return journal
+    journal.flush()
+    return journal
+
+def _dropJournal(directory, layout):
+    'takes a flat or sharded collection directory and its layout. Applies and closes its journal, if it has one, and removes the journal file before the collection changes layout. Returns nothing'
+    key = os.path.abspath(directory)
+    with _journalsLock:
+        isOpen = key in _journals
+    if isOpen or os.path.exists(os.path.join(directory, JOURNAL_FILE)):
+        _openJournal(directory, layout).close()
+        os.remove(os.path.join(directory, JOURNAL_FILE))
+
+def _closeJournals():
+    'commits and closes every open journal. Called when the program exits. Returns nothing'
+    with _journalsLock:
+        journals = list(_journals.values())
+    for journal in journals:
+        journal.close()
+
+atexit.register(_closeJournals)
 
 """def CreateDirect(library, fileName):
     'Takes the currently loaded library and a file name and creates a new directory. Returns an error if directory already exists. Returns nothing'
@@ -34,67 +1040,604 @@ Book = namedtuple("Book", "title author yearPub pageLength dateAdded")
     
 def addBook(library,title,author,yearPub,pageCount): 
     'takes the currently loaded library, plus the information from each book, info received by the GUI, returns the updated library object with new bookList'
+    p = _newBook(title,author,yearPub,pageCount)
+    _writeBooks(library, [p]) #written first, so a failed write leaves the library as it was
+    library.insertBook(p)
+    return library
+
+def importBooks(target,sourcePath,batchSize = IMPORT_BATCH_SIZE,progress = None):
+    'takes the currently loaded library (which the books are added to) or a collection directory path (written to without loading it or keeping the imported books), the path of a .csv or .jsonl file of books and optionally the batch size and a progress function called with (rows imported, rows per second) after every batch. Returns a dict with the rows imported, the seconds taken and the rows per second'
+    start = time.perf_counter()
+    keep = isinstance(target, Library)
+    library = target if keep else _importTarget(target)
+    imported = 0
+    batch = []
+    try:
+        for rowNumber, row in enumerate(readBookRows(sourcePath), 1): #rows are read lazily, so only one batch is held in memory
+            try:
+                batch.append(_newBook(row["title"], row["author"], row["yearPub"], row["pageLength"]))
+            except (KeyError, TypeError, InputError):
+                raise InputError("Row " + str(rowNumber) + " is missing a field or has an invalid value. " +
+                                 str(imported) + " books were imported before it")
+            if len(batch) >= batchSize:
+                imported += _importBatch(library, batch, keep)
+                batch = []
+                if progress is not None:
+                    progress(imported, imported / (time.perf_counter() - start))
+        if batch:
+            imported += _importBatch(library, batch, keep)
+    finally:
+        if not keep and library.layout == "sqlite":
+            library.close()
+    seconds = time.perf_counter() - start
+    stats = {"rows": imported, "seconds": seconds, "rowsPerSecond": imported / seconds if seconds > 0 else 0.0}
+    if progress is not None:
+        progress(imported, stats["rowsPerSecond"])
+    return stats
+
+def readBookRows(sourcePath):
+    'takes the path of a .csv (with a header row) or .jsonl file with title, author, yearPub and pageLength fields. Yields one dict per row, reading the file lazily'
+    suffix = Path(sourcePath).suffix.lower()
+    if suffix not in (".csv", ".jsonl"):
+        raise InputError("Books can only be imported from .csv or .jsonl files")
+    with open(sourcePath, "r", encoding = "utf-8-sig", newline = "") as source: #utf-8-sig drops the byte order mark Excel starts its CSV files with
+        if suffix == ".csv":
+            yield from csv.DictReader(source)
+            return
+        for lineNumber, line in enumerate(source, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                raise InputError("Line " + str(lineNumber) + " of the import file is not valid JSON")
+            if not isinstance(row, dict):
+                raise InputError("Line " + str(lineNumber) + " of the import file is not a JSON object")
+            yield row
+
+def _importBatch(library, books, keep = True):
+    'takes the library being imported into, a batch of new books and whether the library keeps the books it imports. Writes the batch and adds it to the library if it is kept. Returns the number of books in the batch'
+    _writeBooks(library, books)
+    if keep or library.layout == "sqlite": #SQLite libraries write books by inserting them, without holding on to them
+        library.insertBooks(books)
+    return len(books)
+
+def _importTarget(directory):
+    'takes a collection directory path. Returns a library object books can be written to without loading the collection: the SQLite library, or an empty library with the layout (and for .book files, the journal) of the collection'
+    path = Path(directory)
+    if not path.is_dir():
+        raise BadPathError("Given path is not a directory or does not exist")
+    if (path / SQLITE_FILE).is_file():
+        return SQLiteLibrary(directory)
+    if (path / PACK_SEGMENT).is_file():
+        _repairPackedSegment(path / PACK_SEGMENT) #loading a packed collection would otherwise have done this
+        return Library(directory, layout = "packed")
+    library = Library(directory, layout = "sharded" if (path / SHARD_MARKER).is_file() else "flat")
+    library.journal = _openJournal(directory, library.layout)
+    return library
+
+def _newBook(title,author,yearPub,pageCount):
+    'takes the information for a new book. Returns the new book with the current time as its date added, or raises InputError if the information is not valid'
     try:
-        path = library.path
-        title = title
-        author = author
-        yearPub = yearPub
-        pageCount = pageCount
-        dateAdded = time.time()
-        p = Book(title,author,int(yearPub),int(pageCount),dateAdded)
+        title = str(title)
+        author = str(author)
+        recordId = newRecordId()
+        p = Book(title,author,yearPub,pageCount,dateFromRecordId(recordId),recordId)
     except:
         raise InputError("There was an error with your input") #Theortically, this error should never be raised as all the info should be supplied 
-    dateString = str(dateAdded) #allows for a string representation of the date
-    newPath = path + "\\" + dateString + ".book"                    #from the GUI prior to the addBook being called
-    file = newPath #Creates a copy of the directory that is not a Path object
-    newPath = Path(newPath) #takes the current path, adds on the UNIX date and .book extension and makes it a Path object
-    library.bookList.append(p)
-    temp = open(file, "w")
-    temp.write(title + "\n" + author + "\n" + str(yearPub) + "\n" + str(pageCount) + "\n" + dateString)
-    temp.close()
-    return library
+    if "\n" in title or "\n" in author or "\r" in title or "\r" in author: #.book files hold one field per line
+        raise InputError("There was an error with your input")
+    if p.yearPub not in _INT32_RANGE or p.pageLength not in _INT32_RANGE:
+        raise InputError("The year published and page count must be between " + str(_INT32_RANGE.start) + " and " + str(_INT32_RANGE.stop - 1))
+    return p
+
+def _writeBooks(library, books):
+    'takes the currently loaded library and a list of new books. Writes the books to the collection, in a single append for packed collections. Returns nothing'
+    if library.readOnly:
+        raise ReadOnlyError("The collection was opened read-only")
+    if library.layout == "sqlite": #SQLite libraries store books as they are inserted
+        return
+    if library.layout == "packed": #packed collections append the books to the segment file instead of creating files
+        _appendPackedRecords(library.path, [_encodeRecord(_OP_ADD, book.recordId, book) for book in books])
+        return
+    if library.journal is not None: #journaled collections write the .book files once the change is committed
+        library.journal.add(books)
+        return
+    _writeBookFiles(library, books)
+
+def _writeBookFiles(library, books):
+    'takes a flat or sharded library and a list of books. Writes a .book file for each book. Returns the list of paths written'
+    paths = []
+    for book in books:
+        dateString = str(book.dateAdded) #allows for a string representation of the date
+        file = _bookFilePath(library, book.recordId) #takes the current path, adds on the shard (if any), the record id and .book extension
+        try:
+            temp = open(file, "w")
+        except FileNotFoundError:
+            if library.layout != "sharded":
+                raise
+            os.makedirs(os.path.dirname(file), exist_ok = True) #a shard directory was removed outside the program
+            temp = open(file, "w")
+        temp.write(book.title + "\n" + book.author + "\n" + str(book.yearPub) + "\n" + str(book.pageLength) + "\n" + dateString)
+        temp.close()
+        paths.append(file)
+    return paths
 
             
 def deleteBook(library,date):
-    'takes the currently loaded library object and a title of a book to delete. Returns the newly updated library objected'
-    date = str(date) #Ensures date is of string type 
-    if len(library.bookList) == 0:
+    'takes the currently loaded library object and the record id of a book to delete. Returns the newly updated library objected'
+    return deleteBooks(library, [date])
+
+def deleteBooks(library,dates):
+    'takes the currently loaded library object and the record ids of the books to delete. Removes them all in one pass and returns the updated library object'
+    dates = list(dict.fromkeys(str(date) for date in dates)) #Ensures every date is of string type and only listed once
+    if library.readOnly:
+        raise ReadOnlyError("The collection was opened read-only")
+    if len(library) == 0:
         raise EmptyDirectory("You attempted to remove a book from an empty list. Either your loaded directory has no books or you have not loaded a directory")
-    path = library.path + "\\" + date + ".book"
-    #library.path = path
-    newPath = Path(path)
-    if newPath.exists():
-        for x in range(len(library.bookList)):
-            if library.bookList[x].dateAdded.strip() == date: #goes through the bookList, finds the index of the date given, and deletes both
-                index = x                                   #the from bookList and deletes it from the file directory 
-                del library.bookList[index]
-                os.remove(newPath)
-                break            
-            
-    else:
-        raise BookNotFoundError("Book not found in specified directory")
+    for date in dates: #every book is checked before anything is removed, so a failed batch leaves the collection untouched
+        if date not in library:
+            raise BookNotFoundError("Book not found in specified directory")
+        if library.layout in ("flat", "sharded") and not _bookFileExists(library, date):
+            raise BookNotFoundError("Book not found in specified directory")
+    if library.layout == "packed":
+        if not Path(library.path, PACK_SEGMENT).exists():
+            raise BookNotFoundError("Book not found in specified directory")
+        _appendPackedRecords(library.path, [_encodeRecord(_OP_DELETE, date) for date in dates])
+    if library.layout in ("flat", "sharded") and library.journal is not None:
+        library.journal.delete(dates)
+    elif library.layout in ("flat", "sharded"):
+        for date in dates:
+            os.remove(_bookFilePath(library, date))
+    library.removeBooks(dates)
+
+    return library
 
+def _bookFileExists(library, recordId):
+    'takes a flat or sharded library and a record id. Returns whether the book\'s .book file exists, counting changes still waiting in the journal'
+    if library.journal is not None:
+        return library.journal.exists(recordId)
+    return os.path.exists(_bookFilePath(library, recordId))
+
+def loadFile(directory, workers = 1, useCache = True, lazy = False, readOnly = False, journal = False, indexes = ()):
+    'takes a directory path to load in, optionally the number of threads used to read .book files, whether to use the parsed-collection cache, whether to read .book files only when they are accessed (see LazyLibrary), whether to memory map a packed collection read-only (see MappedLibrary), whether to write changes through the collection\'s journal (see Journal) and the names of indexes to build (see Library.useIndex). Returns a library object containing the path and a list of Books'
+    library = _loadLibrary(directory, workers, useCache, lazy, readOnly, journal)
+    if indexes:
+        start = time.perf_counter()
+        for name in indexes: #built in one pass each, then kept up to date by every add and delete
+            library.useIndex(name)
+        library.loadTimings["index"] = time.perf_counter() - start
     return library
 
-def loadFile(directory):
-    'takes a directory path to load in. Returns a library object containing the path and a list of namedTuples'  
+def _loadLibrary(directory, workers, useCache, lazy, readOnly, journal):
+    'takes the arguments of loadFile other than the indexes. Returns the loaded library object'
     library = Library(directory) #creates a current instance of library to be used 
     library.bookList = []
+    library.loadTimings = {} #seconds spent in each phase of the load, useful to tell listing time from reading time
     path = library.path
     path = Path(path) #Makes the string path a path object
     if path.exists() and path.is_dir(): #Makes sure given path exists and is a directory
-        for book in path.iterdir(): #iterates through directory, adding all .book files in said directory to the current instance of bookList
-            if book.is_file() and book.suffix == ".book":
-                temp = open(book, "r")
-                lines = [line.rstrip() for line in temp.readlines()]
-                tempBook = Book(lines[0],lines[1],lines[2],lines[3],lines[4]) #every .book contains a single piece of the required info on its own line
-                library.bookList.append(tempBook)
-                temp.close()
+        start = time.perf_counter()
+        if readOnly: #only a packed collection is a single data file that can be mapped
+            if not (path / PACK_SEGMENT).is_file():
+                raise InputError("Only packed collections can be opened read-only")
+            library = MappedLibrary(directory, path / PACK_SEGMENT)
+            library.loadTimings = {"map": time.perf_counter() - start}
+            return library
+        if (path / SQLITE_FILE).is_file(): #SQLite collections are queried on demand rather than loaded
+            library = SQLiteLibrary(directory)
+            library.loadTimings = {"read": time.perf_counter() - start}
+            return library
+        if (path / PACK_SEGMENT).is_file(): #packed collections are read from their segment file in one sequential read
+            library.layout = "packed"
+            library.bookList = _readPackedSegment(path / PACK_SEGMENT)
+            library.loadTimings["read"] = time.perf_counter() - start
+            return library
+        if (path / SHARD_MARKER).is_file(): #sharded collections keep their .book files in hashed subdirectories
+            library.layout = "sharded"
+        if journal or (path / JOURNAL_FILE).exists(): #changes left in the journal are applied before the .book files are listed
+            try:
+                openJournal = _openJournal(directory, library.layout)
+            except OSError: #a read-only collection still loads, it just cannot be journaled
+                openJournal = None
+            if journal:
+                library.journal = openJournal
+        if lazy: #only the file names are listed, nothing is read or stated until a book is accessed
+            bookFiles = _scanBookFiles(path, library.layout == "sharded", workers, withStat = False)
+            lazyLibrary = LazyLibrary(directory, [(name, bookPath) for name, bookPath, stat in bookFiles], library.layout, workers, useCache)
+            lazyLibrary.journal = library.journal
+            lazyLibrary.loadTimings = {"scan": time.perf_counter() - start}
+            return lazyLibrary
+        bookEntries = _scanBookFiles(path, library.layout == "sharded", workers)
+        cache = _readCache(path) if useCache else {}
+        newCache = {}
+        cached = {} #name -> book for every file whose mtime and size still match the cache
+        changedEntries = []
+        for name, bookPath, stat in bookEntries:
+            hit = cache.get(name)
+            if hit is not None and hit[0] == stat.st_mtime_ns and hit[1] == stat.st_size:
+                cached[name] = Book(*hit[2:])
+                newCache[name] = hit
+            else:
+                changedEntries.append((name, bookPath, stat))
+        library.loadTimings["scan"] = time.perf_counter() - start
+        start = time.perf_counter()
+        changedBooks = _readBookFiles([bookPath for name, bookPath, stat in changedEntries], workers)
+        library.loadTimings["read"] = time.perf_counter() - start
+        for (name, bookPath, stat), book in zip(changedEntries, changedBooks):
+            if book is not None: #files that are not valid .book files are left out, and read again next time
+                cached[name] = book
+                newCache[name] = [stat.st_mtime_ns, stat.st_size, *book]
+        library.bookList = [cached[name] for name, bookPath, stat in bookEntries if name in cached] #keeps the directory listing order
+        if useCache and (changedEntries or len(newCache) != len(cache)): #only rewrite the cache when a file was added, changed or removed
+            _writeCache(path, newCache)
         
     else: #if this is reached then either the path is not a usable input
         raise BadPathError("Given path is not a directory or does not exist")
 
     return library
+
+def _scanBookFiles(path, sharded, workers = 1, withStat = True):
+    'takes a collection directory path, whether it is sharded, the number of threads to list shards with and whether to stat the files. Returns (name, path, stat) for every .book file, where name is the path relative to the collection and stat is None when not asked for'
+    if not sharded:
+        return _scanDirectory(path, "", withStat)
+    with os.scandir(path) as entries:
+        shards = [entry for entry in entries if entry.is_dir() and len(entry.name) == 2]
+    if workers > 1 and len(shards) > 1: #each shard is listed and stated on its own, so they can overlap on a bounded pool
+        with ThreadPoolExecutor(max_workers = workers) as pool:
+            listings = list(pool.map(lambda shard: _scanDirectory(shard.path, shard.name + "/", withStat), shards))
+    else:
+        listings = [_scanDirectory(shard.path, shard.name + "/", withStat) for shard in shards]
+    return [bookFile for listing in listings for bookFile in listing]
+
+def _scanDirectory(directory, prefix, withStat = True):
+    'takes a directory path, the prefix to give the names found in it and whether to stat the files. Returns (name, path, stat) for every .book file directly inside it'
+    with os.scandir(directory) as entries: #scandir reports the entry type from the listing itself, so only .book files are stated
+        return [(prefix + entry.name, entry.path, entry.stat() if withStat else None) for entry in entries
+                if entry.name.endswith(".book") and entry.is_file()]
+
+def _shardOf(recordId):
+    'takes a record id. Returns the name of the shard subdirectory its .book file belongs in'
+    return "%02x" % (zlib.crc32(recordId.encode("utf-8")) % SHARD_COUNT)
+
+def _bookFilePath(library, recordId):
+    'takes a flat or sharded library and a record id. Returns the path of that book\'s .book file'
+    if library.layout == "sharded":
+        return os.path.join(library.path, _shardOf(recordId), recordId + ".book")
+    return os.path.join(library.path, recordId + ".book")
+
+def migrateToSharded(directory):
+    'takes a flat directory of .book files and moves the files into hashed shard subdirectories. Returns the sharded library object'
+    path = Path(directory)
+    if (path / SHARD_MARKER).exists() or (path / PACK_SEGMENT).exists() or (path / SQLITE_FILE).exists():
+        raise InputError("The given directory already holds a sharded, packed or SQLite collection")
+    _dropJournal(directory, "flat")
+    library = loadFile(directory)
+    for shard in range(SHARD_COUNT): #every shard exists up front, so adding a book never has to create one
+        os.makedirs(path / ("%02x" % shard), exist_ok = True)
+    (path / SHARD_MARKER).write_text("%d\n" % SHARD_COUNT)
+    for book in library.bookList: #renames stay within the collection's filesystem, so no book is copied
+        os.replace(path / (book.recordId + ".book"), path / _shardOf(book.recordId) / (book.recordId + ".book"))
+    if (path / CACHE_FILE).exists(): #cached names no longer match the files
+        os.remove(path / CACHE_FILE)
+    return loadFile(directory)
+
+def _removeShards(directory):
+    'takes a sharded collection directory whose .book files were all moved out. Removes the empty shard subdirectories and the shard marker. Returns nothing'
+    for shard in range(SHARD_COUNT):
+        try:
+            os.rmdir(os.path.join(directory, "%02x" % shard))
+        except OSError: #missing, or still holding files that were not part of the collection
+            pass
+    os.remove(os.path.join(directory, SHARD_MARKER))
+
+def _readBookFiles(bookPaths, workers = 1):
+    'takes a list of .book file paths and the number of threads to read them with. Returns the list of books they hold, in the same order'
+    if workers > 1 and len(bookPaths) > 1: #on network filesystems every open and read is a round trip, so they are overlapped on a bounded pool
+        with ThreadPoolExecutor(max_workers = workers) as pool:
+            return list(pool.map(_readBookFile, bookPaths))
+    return [_readBookFile(bookPath) for bookPath in bookPaths]
+
+def _statBookFiles(bookPaths, workers = 1):
+    'takes a list of .book file paths and the number of threads to stat them with. Returns their stat results in the same order, None for files that are gone'
+    def statBookFile(bookPath):
+        try:
+            return os.stat(bookPath)
+        except FileNotFoundError:
+            return None
+    if workers > 1 and len(bookPaths) > 1:
+        with ThreadPoolExecutor(max_workers = workers) as pool:
+            return list(pool.map(statBookFile, bookPaths))
+    return [statBookFile(bookPath) for bookPath in bookPaths]
+
+def _cacheName(bookPath, layout):
+    'takes the path of a .book file and the layout of its collection. Returns the name the parsed-collection cache keeps it under, its path relative to the collection'
+    if layout == "sharded":
+        return os.path.basename(os.path.dirname(bookPath)) + "/" + os.path.basename(bookPath)
+    return os.path.basename(bookPath)
+
+def _readCache(path):
+    'takes the path of a flat collection directory. Returns the cached entries, a dict of file name -> [mtime, size, *book fields], or an empty dict if there is no usable cache'
+    try:
+        with open(path / CACHE_FILE, "r", encoding = "utf-8") as cacheFile:
+            cache = json.load(cacheFile)
+        if cache.get("version") != _CACHE_VERSION:
+            return {}
+        return cache["entries"]
+    except (OSError, ValueError, KeyError, AttributeError): #a missing, unreadable or damaged cache just means every file is read again
+        return {}
+
+def _writeCache(path, entries):
+    'takes the path of a flat collection directory and the entries to cache. Replaces the cache file atomically. Returns nothing'
+    tempPath = path / (CACHE_FILE + ".tmp")
+    try:
+        with open(tempPath, "w", encoding = "utf-8") as cacheFile:
+            json.dump({"version": _CACHE_VERSION, "entries": entries}, cacheFile, separators = (",", ":"))
+        os.replace(tempPath, path / CACHE_FILE)
+    except OSError: #a read-only collection still loads, it just cannot be cached
+        pass
+
+def _readBookFile(bookPath):
+    'takes the path of a .book file. Returns the book it holds, or None if the file is not a valid .book file or is gone'
+    try:
+        with open(bookPath, "r") as temp:
+            lines = [line.rstrip() for line in temp.readlines()]
+    except FileNotFoundError: #removed since the directory was listed
+        return None
+    try:
+        return Book(lines[0],lines[1],lines[2],lines[3],lines[4],Path(bookPath).stem) #every .book contains a single piece of the required info on its own line
+    except (IndexError, ValueError): #any directory can be opened, so a stray or damaged .book file is skipped rather than crashing the load
+        return None
+
+def migrateToPacked(directory):
+    'takes a directory of .book files and converts it into a packed collection, removing the .book files. Returns the packed library object'
+    if Path(directory, PACK_SEGMENT).exists() or Path(directory, SQLITE_FILE).exists():
+        raise InputError("The given directory already holds a packed or SQLite collection")
+    _dropJournal(directory, "sharded" if Path(directory, SHARD_MARKER).exists() else "flat")
+    library = loadFile(directory, LOAD_WORKERS)
+    records = [_encodeRecord(_OP_ADD, book.recordId, book) for book in library.bookList]
+    segmentPath = os.path.join(directory, PACK_SEGMENT)
+    with open(segmentPath + ".tmp", "wb") as segment:
+        segment.write(_PACK_MAGIC + b"".join(records))
+    os.replace(segmentPath + ".tmp", segmentPath) #a crash before this point leaves the .book files in charge
+    for book in library.bookList: #the .book files are only removed once the packed copy is in place
+        os.remove(_bookFilePath(library, book.recordId))
+    if Path(directory, SHARD_MARKER).exists():
+        _removeShards(directory)
+    if Path(directory, CACHE_FILE).exists(): #the parsed-collection cache only applies to .book files
+        os.remove(os.path.join(directory, CACHE_FILE))
+    return loadFile(directory)
+
+def migrateToSQLite(directory):
+    'takes a directory of .book files or a packed collection and converts it into an SQLite collection, removing the old files. Returns the SQLite library object'
+    if Path(directory, SQLITE_FILE).exists():
+        raise InputError("The given directory already holds an SQLite collection")
+    databasePath = os.path.join(directory, SQLITE_FILE)
+    if os.path.exists(databasePath + ".tmp"): #left over from a migration that did not finish
+        os.remove(databasePath + ".tmp")
+    sharded = Path(directory, SHARD_MARKER).exists()
+    if not Path(directory, PACK_SEGMENT).exists():
+        _dropJournal(directory, "sharded" if sharded else "flat")
+    library = SQLiteLibrary(directory, databasePath + ".tmp")
+    recordIds = []
+    for batch in _chunks(iterBooks(directory), IMPORT_BATCH_SIZE): #books are streamed across, never all held in memory
+        library.insertBooks(batch)
+        recordIds.extend(book.recordId for book in batch)
+    library.close()
+    os.replace(databasePath + ".tmp", databasePath) #the old files are only removed once the database is in place
+    if Path(directory, PACK_SEGMENT).exists():
+        os.remove(os.path.join(directory, PACK_SEGMENT))
+    else:
+        booksLibrary = Library(directory, layout = "sharded" if sharded else "flat")
+        for recordId in recordIds:
+            os.remove(_bookFilePath(booksLibrary, recordId))
+        if sharded:
+            _removeShards(directory)
+    if Path(directory, CACHE_FILE).exists():
+        os.remove(os.path.join(directory, CACHE_FILE))
+    return loadFile(directory)
+
+def _encodeRecord(op, recordId, book = None):
+    'takes a record op, the record id and the book (for add records). Returns the record as bytes ready to append to a segment'
+    recordId = recordId.encode("utf-8")
+    if book is None: #delete records only carry the id of the book they remove
+        return _RECORD_HEADER.pack(op, len(recordId), 0, 0, 0, 0, 0.0) + recordId
+    title = book.title.encode("utf-8")
+    author = book.author.encode("utf-8")
+    header = _RECORD_HEADER.pack(op, len(recordId), len(title), len(author),
+                                 book.yearPub, book.pageLength, book.dateAdded)
+    return header + recordId + title + author
+
+def _scanRecords(data, start = len(_PACK_MAGIC)):
+    'takes the bytes of a segment file. Yields (offset, op, record id as bytes) for every complete record without decoding any book'
+    offset = start
+    end = len(data)
+    while offset + _RECORD_HEADER.size <= end:
+        op, idLength, titleLength, authorLength = _RECORD_HEADER.unpack_from(data, offset)[:4]
+        bodyStart = offset + _RECORD_HEADER.size
+        bodyEnd = bodyStart + idLength + titleLength + authorLength
+        if bodyEnd > end: #a partially written record at the end of the segment is ignored
+            return
+        yield offset, op, data[bodyStart:bodyStart + idLength]
+        offset = bodyEnd
+
+def _decodeRecords(data, start = len(_PACK_MAGIC)):
+    'takes the bytes of a segment file. Yields (offset, next offset, op, record id, book) for every complete record, book is None for delete records'
+    offset = start
+    end = len(data)
+    while offset + _RECORD_HEADER.size <= end:
+        op, idLength, titleLength, authorLength, yearPub, pageLength, dateAdded = _RECORD_HEADER.unpack_from(data, offset)
+        bodyStart = offset + _RECORD_HEADER.size
+        bodyEnd = bodyStart + idLength + titleLength + authorLength
+        if bodyEnd > end: #a partially written record at the end of the segment is ignored
+            return
+        recordId = data[bodyStart:bodyStart + idLength].decode("utf-8")
+        book = None
+        if op == _OP_ADD:
+            titleStart = bodyStart + idLength
+            authorStart = titleStart + titleLength
+            book = Book(data[titleStart:authorStart].decode("utf-8"), data[authorStart:bodyEnd].decode("utf-8"),
+                        yearPub, pageLength, dateAdded, recordId)
+        yield offset, bodyEnd, op, recordId, book
+        offset = bodyEnd
+
+def _readPackedSegment(segmentPath):
+    'takes the path of a segment file. Returns the list of books still in the collection after applying every delete record'
+    with open(segmentPath, "rb") as segment:
+        data = segment.read()
+    if not data.startswith(_PACK_MAGIC):
+        raise BadPathError("The collection's packed segment file is damaged")
+    books = {} #dicts keep insertion order, so books come back in the order they were added
+    validEnd = len(_PACK_MAGIC)
+    for offset, validEnd, op, recordId, book in _decodeRecords(data):
+        if op == _OP_ADD:
+            books[recordId] = book
+        else:
+            books.pop(recordId, None)
+    if validEnd < len(data): #a write was cut short, drop the partial record so later appends stay readable
+        with open(segmentPath, "r+b") as segment:
+            segment.truncate(validEnd)
+    return list(books.values())
+
+def _repairPackedSegment(segmentPath):
+    'takes the path of a segment file. Cuts off a record left partly written by a crash, so later appends stay readable, without decoding any book. Returns nothing'
+    with open(segmentPath, "r+b") as segment:
+        size = os.fstat(segment.fileno()).st_size
+        if size < len(_PACK_MAGIC):
+            raise BadPathError("The collection's packed segment file is damaged")
+        with mmap.mmap(segment.fileno(), 0, access = mmap.ACCESS_READ) as data:
+            if data[:len(_PACK_MAGIC)] != _PACK_MAGIC:
+                raise BadPathError("The collection's packed segment file is damaged")
+            validEnd = len(_PACK_MAGIC)
+            for offset, op, recordId in _scanRecords(data):
+                validEnd = offset + _RECORD_HEADER.size + sum(_RECORD_HEADER.unpack_from(data, offset)[1:4])
+        if validEnd < size:
+            segment.truncate(validEnd)
+
+def _appendPackedRecords(directory, records):
+    'takes the directory of a packed collection and a list of encoded records. Appends the records to the segment. Returns nothing'
+    with open(os.path.join(directory, PACK_SEGMENT), "ab") as segment:
+        segment.write(b"".join(records)) #all records of a batch go out in a single write
+
+def exportBooks(source, destination):
+    'takes a library object (exported in its current order) or a collection directory path (streamed from disk) and the path of a .csv, .jsonl or .bookcol file to write. Returns the number of books exported'
+    books = source.bookList if isinstance(source, Library) else iterBooks(source)
+    suffix = Path(destination).suffix.lower()
+    if suffix not in (".csv", ".jsonl", ".bookcol"):
+        raise InputError("Books can only be exported to .csv, .jsonl or .bookcol files")
+    exported = 0
+    if suffix == ".bookcol":
+        with open(destination, "wb", buffering = _EXPORT_BUFFER) as target:
+            target.write(_COLUMNAR_MAGIC)
+            for group in _chunks(books, EXPORT_GROUP_ROWS):
+                target.write(_encodeColumnarGroup(group))
+                exported += len(group)
+            target.write(_GROUP_HEADER.pack(0, 0))
+        return exported
+    with open(destination, "w", encoding = "utf-8", newline = "", buffering = _EXPORT_BUFFER) as target:
+        if suffix == ".csv":
+            writer = csv.writer(target)
+            writer.writerow(["title", "author", "yearPub", "pageLength", "dateAdded", "recordId"])
+            for group in _chunks(books, EXPORT_GROUP_ROWS):
+                writer.writerows(group) #books iterate as their fields
+                exported += len(group)
+        else:
+            fields = ("title", "author", "yearPub", "pageLength", "dateAdded", "recordId")
+            for group in _chunks(books, EXPORT_GROUP_ROWS):
+                target.write("".join(json.dumps(dict(zip(fields, book))) + "\n" for book in group))
+                exported += len(group)
+    return exported
+
+def iterBooks(directory):
+    'takes a collection directory path. Yields its books one at a time straight from disk, without building a library'
+    path = Path(directory)
+    if not path.is_dir():
+        raise BadPathError("Given path is not a directory or does not exist")
+    if (path / SQLITE_FILE).is_file():
+        library = SQLiteLibrary(directory)
+        try:
+            for row in library._connection.execute("SELECT " + _SQLITE_COLUMNS + " FROM books ORDER BY rowid"):
+                yield Book(*row[:6])
+        finally:
+            library.close()
+        return
+    if (path / PACK_SEGMENT).is_file():
+        yield from _iterPackedSegment(path / PACK_SEGMENT)
+        return
+    for name, bookPath, stat in _scanBookFiles(path, (path / SHARD_MARKER).is_file()):
+        book = _readBookFile(bookPath)
+        if book is not None:
+            yield book
+
+def iterColumnarFile(sourcePath):
+    'takes the path of a .bookcol file written by exportBooks. Yields its books one row group at a time'
+    with open(sourcePath, "rb") as source:
+        if source.read(len(_COLUMNAR_MAGIC)) != _COLUMNAR_MAGIC:
+            raise InputError("The given file is not a columnar book export")
+        while True:
+            rows, length = _GROUP_HEADER.unpack(source.read(_GROUP_HEADER.size))
+            if rows == 0:
+                return
+            yield from _decodeColumnarGroup(rows, source.read(length))
+
+def _chunks(books, size):
+    'takes an iterable of books and a chunk size. Yields lists of up to size books'
+    iterator = iter(books)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+def _iterPackedSegment(segmentPath):
+    'takes the path of a segment file. Yields the books still in the collection, memory mapping the segment so it is never read into memory as a whole'
+    with open(segmentPath, "rb") as segment:
+        if os.fstat(segment.fileno()).st_size <= len(_PACK_MAGIC):
+            return
+        with mmap.mmap(segment.fileno(), 0, access = mmap.ACCESS_READ) as data:
+            deletedAt = {} #record id -> offset of its last delete record, the only state kept between the two passes
+            for offset, op, recordId in _scanRecords(data): #the first pass only reads record headers and ids
+                if op == _OP_DELETE:
+                    deletedAt[str(recordId, "utf-8")] = offset
+            for offset, nextOffset, op, recordId, book in _decodeRecords(data):
+                if op == _OP_ADD and deletedAt.get(recordId, -1) < offset:
+                    yield book
+
+def _encodeColumnarGroup(books):
+    'takes a list of books. Returns them encoded as one columnar row group'
+    columns = [_littleEndian(array("i", [book.yearPub for book in books])),
+               _littleEndian(array("i", [book.pageLength for book in books])),
+               _littleEndian(array("d", [book.dateAdded for book in books]))]
+    for field in ("title", "author", "recordId"):
+        values = [getattr(book, field).encode("utf-8") for book in books]
+        columns.append(_littleEndian(array("I", accumulate(len(value) for value in values))))
+        columns.append(b"".join(values))
+    body = b"".join(column.tobytes() if isinstance(column, array) else column for column in columns)
+    return _GROUP_HEADER.pack(len(books), len(body)) + body
+
+def _decodeColumnarGroup(rows, body):
+    'takes the row count and bytes of one columnar row group. Returns the list of books it holds'
+    offset = 0
+    numbers = []
+    for typecode in ("i", "i", "d"):
+        size = rows * array(typecode).itemsize
+        numbers.append(_littleEndian(array(typecode, body[offset:offset + size])))
+        offset += size
+    strings = []
+    for field in range(3): #title, author and record id
+        ends = _littleEndian(array("I", body[offset:offset + rows * 4]))
+        offset += rows * 4
+        starts = [0] + ends[:-1].tolist()
+        strings.append([body[offset + start:offset + end].decode("utf-8") for start, end in zip(starts, ends)])
+        offset += ends[-1]
+    return [Book(strings[0][row], strings[1][row], numbers[0][row], numbers[1][row], numbers[2][row], strings[2][row])
+            for row in range(rows)]
+
+def _littleEndian(column):
+    'takes an array read from or written to a columnar file and swaps it to or from little-endian on big-endian machines. Returns the array'
+    if sys.byteorder == "big":
+        column.byteswap()
+    return column
     
     
 '''
@@ -1,7 +1,40 @@
 # API implemented from: https://openlibrary.org/dev/docs/api/books
 
 import urllib, json
-from urllib import request, error
+from urllib import request, error, parse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import codecs
+import http.client
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+
+# Responses are kept in an SQLite cache on disk so that looking up an ISBN (or an author) seen before needs no
+# network round trip. Entries expire after CACHE_TTL seconds, and once the cache holds CACHE_MAX_ENTRIES responses
+# the least recently used ones are evicted. "Not found" answers are cached too, so a mistyped ISBN is not retried
+# on every press, but only for NEGATIVE_CACHE_TTL seconds, as the book may be added to Open Library later.
+CACHE_PATH = os.path.join(os.path.expanduser("~"), ".library_collection_isbn_cache.sqlite3")
+CACHE_TTL = 30 * 24 * 60 * 60  # seconds, 30 days
+NEGATIVE_CACHE_TTL = 15 * 60  # seconds, 15 minutes
+CACHE_MAX_ENTRIES = 10000
+
+# Where books are looked up, e.g. a mirror or a local stand-in server for testing
+BASE_URL = "https://openlibrary.org"
+
+# Requests go over keep-alive connections that are reused for later requests to the same host, so only the first
+# request to a host pays for the TCP and TLS handshakes. Connecting and each read of a response time out after these
+# many seconds, and at most POOL_MAX_IDLE idle connections are kept per host
+CONNECT_TIMEOUT = 5.0
+READ_TIMEOUT = 10.0
+POOL_MAX_IDLE = 8
+
+# Worker threads and upstream requests per second (with bursts of up to BATCH_BURST) for resolve_isbns
+BATCH_WORKERS = 8
+BATCH_RATE = 10.0
+BATCH_BURST = 10
 
 
 class URLError(Exception):
@@ -21,37 +54,26 @@ class BookAPI:
     # the except statements allow for assign of empty strings temporarily so that crashes don't occur during assignment
     def __init__(self, ISBN):
         self.ISBN = ISBN
-        self.url = "https://openlibrary.org/isbn/" + ISBN + ".json"
-        self.title = ""
-        self.author = ""
-        self.yearPub = ""
-        self.pageCount = ""
-        try:
-            new_object = _download_url(self.url)
+        self.url = _edition_url(ISBN)
+        new_object = _download_edition(self.url)
+        self._read_edition(new_object, _download_author(_author_key(new_object)))
 
-        except urllib.error.URLError:  # Catches if connection drops while processing
-            raise ConnectionError("There was a problem with your internet connection while processing your request")
-
-        except URLError:
-            raise URLError("Book not found. The ISBN provided either does not exist or is not stored in our library")
-
-        except:  # All other errors raised will be treated as input errors
-            raise InputError("An unknown error occurred while processing your input")
+    @classmethod
+    def from_responses(cls, ISBN, new_object: dict, author: str):
+        # builds the BookAPI for an edition response and author name that were already downloaded (see resolve_isbns)
+        book = cls.__new__(cls)
+        book.ISBN = ISBN
+        book.url = _edition_url(ISBN)
+        book._read_edition(new_object, author)
+        return book
 
+    def _read_edition(self, new_object: dict, author: str) -> None:
         try:
             self.title = new_object['title']
         except:
             self.title = ""
 
-        try:
-            # the API returns a key for the author, this key needs to be sent to a new _download_url in order for the actual author to be returned
-            authorKey = new_object['authors'][0]['key']
-            url = "https://openlibrary.org" + str(
-                authorKey) + ".json"  # creates the new link needed to download the author's name
-            temp = _download_url(url)
-            self.author = temp['name']
-        except:
-            self.author = ""
+        self.author = author
 
         try:
             # The format of publish date is often inconsistent. Sometimes it gives (MM/DD/YYYY), (Month D, YYYY), but the year published
@@ -67,21 +89,416 @@ class BookAPI:
             self.pageCount = ""
 
 
-def _download_url(url_to_download: str) -> dict:
-    response = None
+def _edition_url(ISBN: str) -> str:
+    return BASE_URL + "/isbn/" + ISBN + ".json"
+
+
+def _download_edition(url: str, limiter=None) -> dict:
+    try:
+        return _download_url(url, limiter)
+
+    except urllib.error.URLError:  # Catches if connection drops while processing
+        raise ConnectionError("There was a problem with your internet connection while processing your request")
+
+    except URLError:
+        raise URLError("Book not found. The ISBN provided either does not exist or is not stored in our library")
+
+    except:  # All other errors raised will be treated as input errors
+        raise InputError("An unknown error occurred while processing your input")
+
+
+def _author_key(new_object: dict):
+    # the API returns a key for the author, this key needs to be sent to a new _download_url in order for the actual author to be returned
+    try:
+        return new_object['authors'][0]['key']
+    except:
+        return None
+
+
+def _download_author(authorKey, limiter=None) -> str:
+    if authorKey is None:
+        return ""
+    try:
+        url = BASE_URL + str(authorKey) + ".json"  # creates the new link needed to download the author's name
+        return _download_url(url, limiter)['name']
+    except:
+        return ""
+
+
+class TokenBucket:
+    # A thread-safe token bucket: acquire() takes a token, waiting for one to be refilled if the bucket is empty.
+    # Tokens are refilled at rate per second, and at most capacity of them are saved up for a burst.
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def resolve_isbns(ISBNs, workers: int = BATCH_WORKERS, rate: float = BATCH_RATE, burst: int = BATCH_BURST) -> dict:
+    # Looks up many ISBNs at once. Editions are downloaded on a pool of worker threads, and each author is
+    # downloaded as soon as the first edition naming them arrives, once per batch however many editions share them.
+    # Requests that miss the cache are held to rate per second (None for no limit).
+    # Returns a dict of ISBN -> BookAPI, or the ConnectionError, URLError or InputError BookAPI(ISBN) would have raised
+    ISBNs = list(dict.fromkeys(ISBNs))
+    limiter = None if rate is None else TokenBucket(rate, burst)
+    editions = {}
+    authors = {}  # author key -> future of the author's name
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(_download_edition, _edition_url(ISBN), limiter): ISBN for ISBN in ISBNs}
+        for future in as_completed(futures):
+            try:
+                editions[futures[future]] = new_object = future.result()
+            except (ConnectionError, URLError, InputError) as e:
+                editions[futures[future]] = e
+                continue
+            authorKey = _author_key(new_object)
+            if authorKey is not None and authorKey not in authors:
+                authors[authorKey] = pool.submit(_download_author, authorKey, limiter)
+
+    results = {}
+    for ISBN in ISBNs:
+        new_object = editions[ISBN]
+        if isinstance(new_object, Exception):
+            results[ISBN] = new_object
+        else:
+            authorKey = _author_key(new_object)
+            results[ISBN] = BookAPI.from_responses(ISBN, new_object,
+                                                   "" if authorKey is None else authors[authorKey].result())
+    return results
+
+
+class ResponseCache:
+    # A persistent cache of url -> decoded JSON response (None for a 404), safe to share between threads.
+    # hits, misses and evictions count what happened since the cache was opened.
+    def __init__(self, path: str = CACHE_PATH, ttl: float = CACHE_TTL, max_entries: int = CACHE_MAX_ENTRIES,
+                 negative_ttl: float = NEGATIVE_CACHE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl  # for "not found" answers
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        # WAL with synchronous=NORMAL only syncs at checkpoints, so recording a hit does not wait for the disk
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute("CREATE TABLE IF NOT EXISTS responses (url TEXT PRIMARY KEY, body TEXT, "
+                                 "fetched REAL NOT NULL, used REAL NOT NULL)")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS responsesByUse ON responses (used)")
+        self._entries = self._connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def get(self, url: str):
+        # returns (True, response) for a fresh cached response, (False, None) otherwise
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute("SELECT body, fetched FROM responses WHERE url = ?", (url,)).fetchone()
+            if row is None or now - row[1] > (self.ttl if row[0] is not None else self.negative_ttl):
+                self.misses += 1
+                return False, None
+            self._connection.execute("UPDATE responses SET used = ? WHERE url = ?", (now, url))
+            self.hits += 1
+        return True, (None if row[0] is None else json.loads(row[0]))
+
+    def put(self, url: str, response) -> None:
+        # stores a decoded response (None for "not found"), evicting the least recently used entries if the cache is full
+        now = time.time()
+        body = None if response is None else json.dumps(response)
+        with self._lock:
+            self._connection.execute("BEGIN")
+            try:
+                inserted = self._connection.execute("INSERT OR IGNORE INTO responses VALUES (?, ?, ?, ?)",
+                                                    (url, body, now, now)).rowcount
+                if inserted:
+                    self._entries += 1
+                else:  # an expired entry being refreshed
+                    self._connection.execute("UPDATE responses SET body = ?, fetched = ?, used = ? WHERE url = ?",
+                                             (body, now, now, url))
+                if self._entries > self.max_entries:
+                    evicted = self._connection.execute(
+                        "DELETE FROM responses WHERE url IN (SELECT url FROM responses ORDER BY used LIMIT ?)",
+                        (self._entries - self.max_entries,)).rowcount
+                    self._entries -= evicted
+                    self.evictions += evicted
+                self._connection.execute("COMMIT")
+            except sqlite3.Error:
+                self._connection.execute("ROLLBACK")
+                raise
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "entries": self._entries}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._connection.execute("DELETE FROM responses")
+            self._entries = 0
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+
+_cache = None
+_cache_opened = False
+_cache_lock = threading.Lock()
+
+
+def open_cache(path: str = CACHE_PATH, ttl: float = CACHE_TTL, max_entries: int = CACHE_MAX_ENTRIES,
+               negative_ttl: float = NEGATIVE_CACHE_TTL):
+    # (re)opens the response cache used by every lookup, returning it, or None if it could not be opened.
+    # A path of None turns caching off until the cache is opened again
+    global _cache, _cache_opened
+    close_cache()
+    _cache_opened = True
+    if path is None:
+        return None
+    try:
+        _cache = ResponseCache(path, ttl, max_entries, negative_ttl)
+    except sqlite3.Error:  # e.g. the home directory is read-only; lookups then just go to the network
+        _cache = None
+    return _cache
+
+
+def close_cache() -> None:
+    # closes the response cache; the next lookup opens the default one again
+    global _cache, _cache_opened
+    if _cache is not None:
+        _cache.close()
+    _cache = None
+    _cache_opened = False
+
+
+def get_cache():
+    # returns the response cache, opening the default one on first use, or None if there is none
+    with _cache_lock:
+        if not _cache_opened:
+            open_cache()
+    return _cache
+
+
+class ConnectionPool:
+    # Keep-alive http.client connections, kept idle per (scheme, host, port) between requests and safe to share
+    # between threads. get() follows redirects and decodes the response body as it streams in.
+    _REDIRECTS = (301, 302, 303, 307, 308)
+    _MAX_REDIRECTS = 5
+    _CHUNK = 16 * 1024
+    _BAD_PATH = re.compile("[\x00-\x20\x7f]")  # the characters http.client refuses in a request path
+
+    def __init__(self, connect_timeout: float = CONNECT_TIMEOUT, read_timeout: float = READ_TIMEOUT,
+                 max_idle: int = POOL_MAX_IDLE, ssl_context=None):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_idle = max_idle
+        self.ssl_context = ssl_context  # None for the default certificate checks
+        self.connections_opened = 0
+        self._idle = {}  # (scheme, host, port) -> idle connections, most recently used last
+        self._lock = threading.Lock()
+
+    def get(self, url: str):
+        # returns (HTTP status, decoded body text) for a GET of url
+        for redirect in range(self._MAX_REDIRECTS + 1):
+            status, location, body = self._get_once(url)
+            if status not in self._REDIRECTS or location is None:
+                return status, body
+            url = urllib.parse.urljoin(url, location)
+        raise http.client.HTTPException("Too many redirects")
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for connection in connections:
+                connection.close()
+
+    def _get_once(self, url: str):
+        parts = urllib.parse.urlsplit(url)
+        key = (parts.scheme, parts.hostname, parts.port)
+        path = (parts.path or "/") + ("?" + parts.query if parts.query else "")
+        # checked before taking a connection, as http.client leaves a connection unusable once it refuses a path
+        if self._BAD_PATH.search(path):
+            raise http.client.InvalidURL(f"URL can't contain control characters. {path!r}")
+        while True:
+            connection, reused = self._take(key)
+            try:
+                connection.request("GET", path, headers={"Accept": "application/json", "Accept-Encoding": "gzip"})
+                response = connection.getresponse()
+                body = self._read_body(response)
+                response.close()  # lets the connection send its next request
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                connection.close()
+                if reused:  # the server closed the idle connection in the meantime, so try a fresh one
+                    continue
+                raise
+            except:
+                connection.close()
+                raise
+            if response.will_close:
+                connection.close()
+            else:
+                self._give(key, connection)
+            return response.status, response.getheader("Location"), body
+
+    def _read_body(self, response) -> str:
+        # decompresses and decodes the body chunk by chunk as it arrives, rather than once it is all in memory
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS) \
+            if response.getheader("Content-Encoding", "").lower() == "gzip" else None
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        pieces = []
+        while True:
+            chunk = response.read1(self._CHUNK)
+            if not chunk:
+                break
+            if decompressor is not None:
+                chunk = decompressor.decompress(chunk)
+            pieces.append(decoder.decode(chunk))
+        if decompressor is not None:
+            pieces.append(decoder.decode(decompressor.flush()))
+        pieces.append(decoder.decode(b"", final=True))
+        return "".join(pieces)
+
+    def _take(self, key):
+        # returns (connection, whether it was reused) for the host of key
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                return idle.pop(), True
+        scheme, host, port = key
+        if scheme == "https":
+            connection = http.client.HTTPSConnection(host, port, timeout=self.connect_timeout, context=self.ssl_context)
+        elif scheme == "http":
+            connection = http.client.HTTPConnection(host, port, timeout=self.connect_timeout)
+        else:
+            raise http.client.InvalidURL("Unsupported URL scheme: " + str(scheme))
+        connection.connect()
+        connection.sock.settimeout(self.read_timeout)  # the connect timeout only covers the handshakes
+        with self._lock:
+            self.connections_opened += 1
+        return connection, False
+
+    def _give(self, key, connection) -> None:
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle:
+                idle.append(connection)
+                return
+        connection.close()
+
+
+connection_pool = ConnectionPool()
+
+
+class SingleFlight:
+    # Coalesces concurrent calls for the same key: the first caller (the leader) runs the function, and callers
+    # asking for the key while it runs wait for it and share its result or exception.
+    # fetches counts the functions run, coalesced the callers that shared another caller's result instead.
+    def __init__(self):
+        self.fetches = 0
+        self.coalesced = 0
+        self._calls = {}  # key -> _Call in flight
+        self._lock = threading.Lock()
+
+    def do(self, key, function):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.fetches += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = function()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"fetches": self.fetches, "coalesced": self.coalesced, "in_flight": len(self._calls)}
+
+
+class _Call:
+    # a call of SingleFlight in flight
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+request_coalescer = SingleFlight()
+
+
+def _download_url(url_to_download: str, limiter=None) -> dict:
+    cache = get_cache()
+    if cache is not None:
+        try:
+            found, r_obj = cache.get(url_to_download)
+        except sqlite3.Error:  # e.g. locked by another program for too long, so just go to the network
+            found = False
+        if found:
+            if r_obj is None:
+                raise URLError()
+            return r_obj
+
+    # callers asking for a url that is already being downloaded wait for that download instead of starting another
+    return request_coalescer.do(url_to_download, lambda: _fetch_url(url_to_download, cache, limiter))
+
+
+def _fetch_url(url_to_download: str, cache, limiter) -> dict:
+    # only requests that go upstream count against the rate limit
+    if limiter is not None:
+        limiter.acquire()
+
     r_obj = None
     error = 0
     try:
-        response = urllib.request.urlopen(url_to_download)
-        json_results = response.read()
-        r_obj = json.loads(json_results)
+        status, json_results = connection_pool.get(url_to_download)
 
-    except urllib.error.HTTPError as e:
-        error = e.code
+    except http.client.InvalidURL:  # e.g. an ISBN with a space in it, left for BookAPI to report as an input error
+        raise
 
-    finally:
-        if response != None:
-            response.close()
+    except (OSError, http.client.HTTPException) as e:  # Reported like urlopen does, as a connection problem
+        raise urllib.error.URLError(e)
+
+    if status == 200:
+        r_obj = json.loads(json_results)
+    else:
+        error = status
+
+    # other HTTP errors may be temporary, so only successful and "not found" responses are kept
+    if cache is not None and error in (0, 404):
+        try:
+            cache.put(url_to_download, None if error == 404 else r_obj)
+        except sqlite3.Error:
+            pass
 
     if error == 404:
         raise URLError()
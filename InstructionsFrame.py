@@ -17,6 +17,8 @@ _VIEW_COLLECTION_LABEL = "Viewing a Collection"
 _ADD_BOOK_LABEL = "Adding a Book"
 _DELETE_BOOK_LABEL = "Deleting a Book"
 _SORTING_BOOKS_LABEL = "Sorting a Collection"
+_SEARCH_LABEL = "Searching a Collection"
+_FILTER_LABEL = "Filtering a Collection"
 _ISBN_LABEL = "Using an ISBN"
 _DIVIDER = "--------------------"
 
@@ -31,6 +33,10 @@ _TUTORIAL_LABELS = [_DIVIDER,
                     _DIVIDER,
                     _SORTING_BOOKS_LABEL,
                     _DIVIDER,
+                    _SEARCH_LABEL,
+                    _DIVIDER,
+                    _FILTER_LABEL,
+                    _DIVIDER,
                     _ISBN_LABEL,
                     _DIVIDER]
 
@@ -87,7 +93,9 @@ _SORTING_BOOKS_INSTRUCTION =\
     "\n\nChanging the sorting methodology will also affect the book currently being viewed. E.g. if book 1 is" +\
     " being viewed, whatever book is first in the new sorting methodology will be the one to appear in the" +\
     " view screen." +\
-    "\n\nBy default, the collection is sorted according to each book's title (in alphabetical order)." +\
+    "\n\nBy default, the collection is sorted according to each book's date added to the collection" +\
+    " (in ascending order), which shows the first book straight away however large the collection is." +\
+    "\n\nSelecting \"Title\" will sort the collection according to each book's title (in alphabetical order)." +\
     "\n\nSelecting \"Author\" will sort the collection according to each book's author name (in alphabetical order)." +\
     "\n\nSelecting \"Year Published\" will sort the collection according to each book's year published name" +\
     " (in ascending order)." +\
@@ -96,6 +104,22 @@ _SORTING_BOOKS_INSTRUCTION =\
     "\n\nSelecting \"Date Added\" will sort the collection according to each book's date added to the collection" +\
     " (in ascending order)."
 
+_SEARCH_INSTRUCTION =\
+    f"{_SEARCH_LABEL}:" +\
+    f'\n\nOnce a collection has been viewed (see "{_VIEW_COLLECTION_LABEL}"), you can type words from a book\'s' +\
+    ' title or author into the search box and click "SEARCH" (or press Enter) to jump straight to the best' +\
+    " matching book." +\
+    "\n\nThe last word may be just the start of a word, if it is at least three letters long." +\
+    "\n\nClicking \"SEARCH\" again with the same words moves on to the next match."
+
+_FILTER_INSTRUCTION =\
+    f"{_FILTER_LABEL}:" +\
+    f'\n\nOnce a collection has been viewed (see "{_VIEW_COLLECTION_LABEL}"), you can fill in any of the filter' +\
+    ' fields below the book and click "FILTER BOOKS" to only browse the books published, of a page length, or' +\
+    " added between the entered values (either end may be left empty), and by the entered author." +\
+    "\n\nDates added are entered as year-month-day, e.g. 2021-03-14." +\
+    "\n\nClicking \"SHOW ALL BOOKS\" goes back to browsing the whole collection."
+
 _ISBN_INSTRUCTION =\
     f"{_ISBN_LABEL}:" +\
     f'\n\nWhen adding a book (see "{_ADD_BOOK_LABEL}"), you can use a book\'s ISBN to partially or fully fill the' +\
@@ -109,7 +133,13 @@ _ISBN_INSTRUCTION =\
     "In this case, you will have the opportunity to correct or add any missing information by using the associated " +\
     "entry fields." +\
     "\n\nOnce you have pulled the ISBN data and performed any necessary corrections, you can add the book as normal " +\
-    f"(see {_ADD_BOOK_LABEL})"
+    f"(see {_ADD_BOOK_LABEL})" +\
+    "\n\nISBN lookups run in the background, so the window keeps responding. ISBNs entered while a lookup is " +\
+    "running are queued, and their results are filled in one at a time, the next one after the current book is " +\
+    "added or skipped with \"SKIP BOOK\". A lookup that finds nothing does not hold the queue back. " +\
+    "\"CANCEL LOOKUP\" abandons every queued lookup." +\
+    "\n\nLooked up ISBNs are remembered for 30 days, so looking one up again is instant and works offline. " +\
+    "An ISBN that was not found is only remembered for 15 minutes, in case it is added to Open Library later."
 
 # Constant dict for accessing instruction strings using their label
 _INSTRUCTION_DICTIONARY = {_OPEN_COLLECTION_LABEL: _OPEN_COLLECTION_INSTRUCTION,
@@ -117,6 +147,8 @@ _INSTRUCTION_DICTIONARY = {_OPEN_COLLECTION_LABEL: _OPEN_COLLECTION_INSTRUCTION,
                            _ADD_BOOK_LABEL: _ADD_BOOK_INSTRUCTION,
                            _DELETE_BOOK_LABEL: _DELETE_BOOK_INSTRUCTION,
                            _SORTING_BOOKS_LABEL: _SORTING_BOOKS_INSTRUCTION,
+                           _SEARCH_LABEL: _SEARCH_INSTRUCTION,
+                           _FILTER_LABEL: _FILTER_INSTRUCTION,
                            _ISBN_LABEL: _ISBN_INSTRUCTION}
 
 
@@ -19,6 +19,7 @@ from InstructionsFrame import InstructionsFrame
 import os
 
 import FileLoader
+from CollectionWatcher import CollectionWatcher
 
 # Constants for the window length and width
 _WINDOW_WIDTH = 800
@@ -28,6 +29,9 @@ _WINDOW_LENGTH = 600
 _BUTTON_WIDTH = 15
 _BUTTON_LENGTH = 2
 
+# Milliseconds between applying the changes the collection watcher noticed
+_WATCH_INTERVAL = 500
+
 
 class LibraryCollectionGUI:
     """
@@ -68,6 +72,9 @@ class LibraryCollectionGUI:
 
         self.activeCollection = None
 
+        # To hold the watcher keeping the active collection in step with changes made outside the program
+        self.collectionWatcher = None
+
         # End of init()
 
     def start(self) -> None:
@@ -132,13 +139,17 @@ class LibraryCollectionGUI:
         else:
             # Attempt to load the directory path and the .book files contained therein
             try:
-                self.activeCollection = FileLoader.loadFile(directoryPath)
+                self.activeCollection = FileLoader.loadFile(directoryPath, FileLoader.LOAD_WORKERS, lazy=True,
+                                                            journal=True)
 
             # If failed, show an error pop-up and end the event
             except FileLoader.BadPathError as message:
                 messagebox.showerror("ERROR", message)
                 return
 
+            # Watch the collection's files for changes made outside the program
+            self._watchCollection()
+
             # If successful, show a success pop-up and send the collection name to the collection frame
             messagebox.showinfo("LOAD COMPLETE", f"Successfully Loaded: {os.path.basename(directoryPath)}!")
             self.collectionMenuFrame.collectionName = os.path.basename(directoryPath)
@@ -189,6 +200,8 @@ class LibraryCollectionGUI:
         :return: None
         """
 
+        self._stopWatchingCollection()
+
         self.window.destroy()
 
         quit()
@@ -251,16 +264,26 @@ class LibraryCollectionGUI:
         :return: None
         """
 
-        # Ensure that the directory still exists by attempting to reload the directory path and the .book files
-        # contained therein
-        try:
-            self.activeCollection = FileLoader.loadFile(self.activeCollection.path)
-        # If failed, show an error pop-up and end the event
-        except FileLoader.BadPathError:
-            messagebox.showerror("ERROR", "The entire collection directory was removed outside the program!" +
-                                 "\n\nReturning to main menu...")
-            self._collectionBackEvent()
-            return
+        # A watched collection is already up to date, so only ensure that the directory still exists
+        if self.collectionWatcher is not None:
+            if not os.path.isdir(self.activeCollection.path):
+                messagebox.showerror("ERROR", "The entire collection directory was removed outside the program!" +
+                                     "\n\nReturning to main menu...")
+                self._collectionBackEvent()
+                return
+
+        # Otherwise, ensure that the directory still exists by attempting to reload the directory path and the
+        # .book files contained therein
+        else:
+            try:
+                self.activeCollection = FileLoader.loadFile(self.activeCollection.path, FileLoader.LOAD_WORKERS,
+                                                             lazy=True, journal=True)
+            # If failed, show an error pop-up and end the event
+            except FileLoader.BadPathError:
+                messagebox.showerror("ERROR", "The entire collection directory was removed outside the program!" +
+                                     "\n\nReturning to main menu...")
+                self._collectionBackEvent()
+                return
 
         # Send the loaded .book files into the view collection frame
         self.viewCollectionFrame.bookCollection = self.activeCollection
@@ -302,6 +325,8 @@ class LibraryCollectionGUI:
         :return: None
         """
 
+        self._stopWatchingCollection()
+
         self.collectionMenuFrame.destroy()
 
         self.mainMenuFrame.draw()
@@ -337,6 +362,8 @@ class LibraryCollectionGUI:
         :return: None
         """
 
+        self._stopWatchingCollection()
+
         self.viewCollectionFrame.destroy()
 
         self.mainMenuFrame.draw()
@@ -372,10 +399,94 @@ class LibraryCollectionGUI:
         :return: None
         """
 
+        self._stopWatchingCollection()
+
         self.addBookFrame.destroy()
 
         self.mainMenuFrame.draw()
 
         # End of crashAddBookToMainMenuEvent()
 
+    #
+    #
+    # COLLECTION WATCHER EVENTS
+    #
+    #
+    def _watchCollection(self) -> None:
+        """
+        Starts watching the active collection's .book files for changes made outside the program, replacing any
+        watcher of a previously opened collection.
+
+        Packed and SQLite collections are not watched, they are reloaded when viewed instead.
+
+        :return: None
+        """
+
+        self._stopWatchingCollection()
+
+        try:
+            self.collectionWatcher = CollectionWatcher(self.activeCollection)
+            self.collectionWatcher.start()
+        except (FileLoader.InputError, OSError):
+            self.collectionWatcher = None
+            return
+
+        self.window.after(_WATCH_INTERVAL, self._watchCollectionEvent, self.collectionWatcher)
+
+        # End of watchCollection()
+
+    def _stopWatchingCollection(self) -> None:
+        """
+        Stops watching the active collection, if it is being watched.
+
+        :return: None
+        """
+
+        if self.collectionWatcher is not None:
+            self.collectionWatcher.stop()
+            self.collectionWatcher = None
+
+        # End of stopWatchingCollection()
+
+    def _watchCollectionEvent(self, watcher: CollectionWatcher) -> None:
+        """
+        Timer Event Function that applies the changes the collection watcher noticed to the active collection and
+        redraws the book being viewed, or returns to the main menu if the collection directory was removed.
+
+        Reschedules itself for as long as the collection is watched by the same watcher.
+
+        :param watcher: The watcher that scheduled this event.
+        :return: None
+        """
+
+        # If the collection stopped being watched, or another collection was opened since, end the event without
+        # rescheduling it
+        if watcher is not self.collectionWatcher:
+            return
+
+        changes = watcher.applyChanges()
+
+        # If the entire directory was removed, return to the main menu from whichever frame is drawn
+        if changes["collectionRemoved"]:
+            messagebox.showerror("ERROR", "The entire collection directory was removed outside the program!" +
+                                 "\n\nReturning to main menu...")
+
+            if self.viewCollectionFrame.viewCollectionFrame is not None:
+                self._crashViewCollectionToMainMenuEvent()
+            elif self.addBookFrame.addBookFrame is not None:
+                self._crashAddBookToMainMenuEvent()
+            elif self.collectionMenuFrame.collectionMenuFrame is not None:
+                self._collectionBackEvent()
+            else:
+                self._stopWatchingCollection()
+            return
+
+        # Redraw the book being viewed if any book changed
+        if changes["added"] or changes["changed"] or changes["removed"]:
+            self.viewCollectionFrame.refresh()
+
+        self.window.after(_WATCH_INTERVAL, self._watchCollectionEvent, watcher)
+
+        # End of watchCollectionEvent()
+
     # End of LibraryCollectionGUI
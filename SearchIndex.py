@@ -0,0 +1,248 @@
+from bisect import bisect_left, insort
+import heapq
+import math
+import re
+
+### Full-text search over book titles and authors
+###
+### A TextIndex is an inverted index: every word of a book's title and author maps to the record ids of the books
+### containing it, together with a weight saying where the word was found (TITLE_WEIGHT for the title,
+### AUTHOR_WEIGHT for the author, their sum for both). A sorted list of every indexed word lets a prefix query
+### find the words it matches by binary search. A library keeps its index up to date as books are added and removed
+### (see Library.useIndex), so it only has to be built once.
+###
+### Queries are made of words; a word ending in * matches every word starting with it, if it is at least
+### PREFIX_MIN_LENGTH letters long (shorter prefixes match too many words to be useful, so they only match the whole
+### word). A book must match every word of the query, and hits are ranked by the sum of the weights of the words they
+### matched, with prefix matches counting for less than whole words. Only the rarest word of the query is expanded
+### into its books; each book found is then looked up in the postings of the other words, so a prefix matching
+### thousands of books costs little once another word has narrowed the books down.
+###
+### Fuzzy queries find misspelled words through a trigram index over the indexed words (not the books): each word
+### is split into the overlapping three letter pieces of "$word$", and two words are as similar as the share of
+### trigrams they have in common (Jaccard similarity). The trigram index is built the first time a fuzzy query is
+### made and kept up to date from then on. Only the words sharing one of the query word's rarest trigrams are
+### compared, which is enough to find every word above the similarity threshold (prefix filtering), and the books
+### are then found through the postings of the similar words.
+
+TITLE_WEIGHT = 2
+AUTHOR_WEIGHT = 1
+PREFIX_FACTOR = 0.5 #share of a word's weight a prefix match earns
+PREFIX_MIN_LENGTH = 3 #letters a query word ending in * needs to match the words starting with it
+SEARCH_LIMIT = 20 #hits returned by default
+FUZZY_THRESHOLD = 0.4 #least trigram similarity for a word to count as a misspelling of another
+
+_WORD = re.compile(r"\w+")
+_QUERY_WORD = re.compile(r"\w+\*?")
+
+def words(text):
+    'takes a string. Returns the lower-cased words in it'
+    return _WORD.findall(text.casefold())
+
+def trigrams(word):
+    'takes a lower-cased word. Returns the set of trigrams of the word padded with $ on both ends'
+    padded = "$" + word + "$"
+    return {padded[start:start + 3] for start in range(len(padded) - 2)}
+
+def _bookWords(book):
+    'takes a book. Returns a dict of word -> weight for every word of its title and author'
+    weights = dict.fromkeys(words(book.title), TITLE_WEIGHT)
+    for word in words(book.author):
+        weights[word] = weights.get(word, 0) | AUTHOR_WEIGHT
+    return weights
+
+class TextIndex:
+    'an inverted index from the words of every book\'s title and author to the record ids of the books containing them'
+    def __init__(self):
+        self._postings = {} #word -> {record id: weight}
+        self._words = [] #every indexed word, sorted, for prefix queries
+        self._trigrams = None #trigram -> set of the indexed words containing it, built by the first fuzzy query
+
+    def __len__(self):
+        return len(self._postings)
+
+    def build(self, books):
+        'takes every book of a library. Replaces the contents of the index with those books in one pass. Returns nothing'
+        postings = {}
+        for book in books:
+            for word, weight in _bookWords(book).items():
+                posting = postings.get(word)
+                if posting is None:
+                    posting = postings[word] = {}
+                posting[book.recordId] = weight
+        self._postings = postings
+        self._words = sorted(postings)
+        self._trigrams = None
+
+    def add(self, book):
+        'takes a book added to the library. Indexes its words. Returns nothing'
+        for word, weight in _bookWords(book).items():
+            posting = self._postings.get(word)
+            if posting is None:
+                posting = self._postings[word] = {}
+                insort(self._words, word)
+                if self._trigrams is not None:
+                    for trigram in trigrams(word):
+                        self._trigrams.setdefault(trigram, set()).add(word)
+            posting[book.recordId] = weight
+
+    def remove(self, book):
+        'takes a book removed from the library. Drops it from the index. Returns nothing'
+        for word in _bookWords(book):
+            posting = self._postings.get(word)
+            if posting is None:
+                continue
+            posting.pop(book.recordId, None)
+            if not posting: #the last book with this word is gone
+                del self._postings[word]
+                del self._words[bisect_left(self._words, word)]
+                if self._trigrams is not None:
+                    for trigram in trigrams(word):
+                        self._trigrams[trigram].discard(word)
+                        if not self._trigrams[trigram]:
+                            del self._trigrams[trigram]
+
+    def search(self, query, limit = SEARCH_LIMIT):
+        'takes a query and the most hits to return. Returns the record ids of the books matching every word of the query, best match first'
+        terms = []
+        for term in dict.fromkeys(_QUERY_WORD.findall(query.casefold())):
+            sources = self._sources(term)
+            if not sources: #a word nothing matches, so no book matches the whole query
+                return []
+            terms.append(sources)
+        if not terms:
+            return []
+        terms.sort(key = lambda sources: sum(len(posting) for posting, factor in sources))
+        if len(terms) == 1:
+            return _bestOfSources(terms[0], limit)
+        scores = _merge(terms[0]) #the rarest term gives the fewest candidates
+        for sources in terms[1:]:
+            best = {} #candidate record id -> its best weighted score for this term
+            for posting, factor in sources:
+                for recordId in posting.keys() & scores.keys(): #walks whichever of the two is smaller
+                    score = posting[recordId] * factor
+                    if score > best.get(recordId, 0):
+                        best[recordId] = score
+            if not best:
+                return []
+            scores = {recordId: scores[recordId] + score for recordId, score in best.items()}
+        return _best(scores, limit)
+
+    def fuzzySearch(self, query, threshold = FUZZY_THRESHOLD, limit = SEARCH_LIMIT):
+        'takes a query of possibly misspelled words, the least similarity (0 to 1) a word needs to match and the most hits to return. Returns the record ids of the books with a similar word for every word of the query, most similar first'
+        if self._trigrams is None:
+            self._buildTrigrams()
+        scores = None
+        for term in dict.fromkeys(words(query)):
+            termScores = {} #record id -> similarity of its best word for this term
+            for word, similarity in self.similarWords(term, threshold).items():
+                for recordId in self._postings[word]:
+                    if similarity > termScores.get(recordId, 0):
+                        termScores[recordId] = similarity
+            if scores is None:
+                scores = termScores
+            else:
+                scores = {recordId: score + termScores[recordId] for recordId, score in scores.items() if recordId in termScores}
+            if not scores:
+                return []
+        if scores is None:
+            return []
+        return _best(scores, limit)
+
+    def similarWords(self, term, threshold = FUZZY_THRESHOLD):
+        'takes a word and the least similarity (0 to 1) to accept. Returns a dict of indexed word -> similarity for every indexed word at least that similar to it'
+        if self._trigrams is None:
+            self._buildTrigrams()
+        termTrigrams = trigrams(term.casefold())
+        needed = max(1, math.ceil(threshold * len(termTrigrams))) #a similar word shares at least this many trigrams
+        rarest = sorted(termTrigrams, key = lambda trigram: len(self._trigrams.get(trigram, ())))
+        candidates = set()
+        for trigram in rarest[:len(termTrigrams) - needed + 1]: #a word sharing none of these cannot share enough
+            candidates.update(self._trigrams.get(trigram, ()))
+        similar = {}
+        for word in candidates:
+            if len(word) + 2 < threshold * len(termTrigrams): #too few trigrams to share enough of them
+                continue
+            wordTrigrams = trigrams(word)
+            shared = len(termTrigrams & wordTrigrams)
+            similarity = shared / (len(termTrigrams) + len(wordTrigrams) - shared)
+            if similarity >= threshold:
+                similar[word] = similarity
+        return similar
+
+    def _buildTrigrams(self):
+        'builds the trigram index over every indexed word. Returns nothing'
+        index = {}
+        for word in self._words:
+            for trigram in trigrams(word):
+                wordsWithTrigram = index.get(trigram)
+                if wordsWithTrigram is None:
+                    wordsWithTrigram = index[trigram] = set()
+                wordsWithTrigram.add(word)
+        self._trigrams = index
+
+    def _sources(self, term):
+        'takes one query word. Returns a list of (posting, weight factor) for the indexed words it matches'
+        if not term.endswith("*"):
+            posting = self._postings.get(term)
+            return [] if posting is None else [(posting, 1.0)]
+        prefix = term[:-1]
+        if len(prefix) < PREFIX_MIN_LENGTH:
+            return self._sources(prefix)
+        sources = []
+        for position in range(bisect_left(self._words, prefix), len(self._words)):
+            word = self._words[position]
+            if not word.startswith(prefix):
+                break
+            sources.append((self._postings[word], 1.0 if word == prefix else PREFIX_FACTOR))
+        return sources
+
+def _merge(sources):
+    'takes a list of (posting, weight factor). Returns a dict of record id -> best weighted score over all of them'
+    if len(sources) == 1 and sources[0][1] == 1.0:
+        return sources[0][0]
+    scores = {}
+    for factor in dict.fromkeys(factor for posting, factor in sources): #every prefix match shares one factor
+        weights = {} #record id -> best weight among the postings with this factor
+        for posting, postingFactor in sources:
+            if postingFactor != factor:
+                continue
+            kept = {recordId: weights[recordId] for recordId in posting.keys() & weights.keys()
+                    if weights[recordId] > posting[recordId]}
+            weights.update(posting) #a book is rarely in two of the postings, so whole postings are copied at once
+            weights.update(kept)
+        for recordId, weight in weights.items():
+            score = weight * factor
+            if score > scores.get(recordId, 0):
+                scores[recordId] = score
+    return scores
+
+def _best(scores, limit):
+    'takes a dict of record id -> score and the most hits to return. Returns the record ids with the highest scores, ties by record id'
+    if len(scores) <= limit:
+        return [recordId for recordId, score in sorted(scores.items(), key = lambda hit: (-hit[1], hit[0]))]
+    hits = []
+    for level in sorted(set(scores.values()), reverse = True): #scores only take a few distinct values
+        tied = [recordId for recordId, score in scores.items() if score == level]
+        hits.extend(heapq.nsmallest(limit - len(hits), tied))
+        if len(hits) >= limit:
+            return hits
+    return hits
+
+def _bestOfSources(sources, limit):
+    'takes the (posting, weight factor) list of one query word and the most hits to return. Returns the same hits as _best(_merge(sources), limit), collecting the books one score at a time, highest first, until there are enough instead of merging every posting'
+    levels = {} #score -> (posting, weight) pairs whose books with that weight earn the score
+    for posting, factor in sources:
+        for weight in (TITLE_WEIGHT, AUTHOR_WEIGHT, TITLE_WEIGHT | AUTHOR_WEIGHT):
+            levels.setdefault(weight * factor, []).append((posting, weight))
+    hits = []
+    found = set() #books already placed at a higher score
+    for level in sorted(levels, reverse = True):
+        tied = {recordId for posting, weight in levels[level]
+                for recordId, recordWeight in posting.items() if recordWeight == weight}
+        tied -= found
+        hits.extend(heapq.nsmallest(limit - len(hits), tied))
+        if len(hits) >= limit:
+            return hits
+        found |= tied
+    return hits
@@ -10,13 +10,11 @@ from tkinter import messagebox
 
 import time
 
-from FileLoader import Library, BookNotFoundError, BadPathError
+from FileLoader import Library, BookNotFoundError
 import FileLoader
 
 import sortModules
 
-import copy
-
 # Constants for the button length and width
 _BUTTON_WIDTH = 15
 _BUTTON_LENGTH = 2
@@ -28,6 +26,15 @@ _SORT_YEAR_PUBLISHED = "Year Published"
 _SORT_PAGE_LENGTH = "Page Length   "
 _SORT_DATE_ADDED = "Date Added    "
 
+# Constants for the search entry width and the number of search results to step through
+_SEARCH_WIDTH = 17
+_SEARCH_RESULTS = 50
+
+# Constants for the filter entry widths and the format of the date added filter entries
+_FILTER_WIDTH = 6
+_FILTER_DATE_WIDTH = 10
+_FILTER_DATE_FORMAT = "%Y-%m-%d"
+
 
 class ViewCollectionFrame:
     """
@@ -62,8 +69,28 @@ class ViewCollectionFrame:
         # To hold which book the user is currently viewing in the list
         self.currentBookIndex = 0
 
-        # To hold the sorting technique currently in use
-        self.sortingTechnique = tkinter.StringVar(value=_SORT_TITLE)
+        # To hold the sorting technique currently in use. Date added is the default, as it is the only order a lazily
+        # loaded collection can show without reading every book first
+        self.sortingTechnique = tkinter.StringVar(value=_SORT_DATE_ADDED)
+
+        # To hold the words to search for, the results of the last search, and which result is being viewed
+        self.searchQuery = tkinter.StringVar()
+        self.searchResults = []
+        self.searchResultIndex = 0
+        self.lastSearchQuery = None
+
+        # To hold the ranges and author entered to filter the books by
+        self.yearFrom = tkinter.StringVar()
+        self.yearTo = tkinter.StringVar()
+        self.pagesFrom = tkinter.StringVar()
+        self.pagesTo = tkinter.StringVar()
+        self.addedFrom = tkinter.StringVar()
+        self.addedTo = tkinter.StringVar()
+        self.filterAuthor = tkinter.StringVar()
+
+        # To hold the filter in use (None when browsing the whole collection) and the books matching it
+        self.activeFilter = None
+        self.filteredBooks = None
 
         # End of init()
 
@@ -78,11 +105,12 @@ class ViewCollectionFrame:
         # To hold the text of the first book to draw
         currentBookText = None
         self.currentBookIndex = 0
+        self._clearFilter()
 
         # Get the current book as formatted text, or raise an AttributeError if the list was empty
         try:
-            # Sort the library by book title by default
-            sortModules.sortByTitle(self.bookCollection)
+            # Sort the library by the selected sorting technique (date added by default)
+            self._sortBySelectedTechnique()
 
             currentBookText = self._getCurrentBookText()
         except IndexError:
@@ -121,8 +149,19 @@ class ViewCollectionFrame:
             tkinter.Button(upDownButtonFrame, text="NEXT BOOK", command=self._down,
                            width=_BUTTON_WIDTH, height=_BUTTON_LENGTH)
 
+        # Construct the search entry and button, which jump straight to the books matching the entered words
+        searchEntry = \
+            tkinter.Entry(upDownButtonFrame, textvariable=self.searchQuery, font="TkFixedFont", width=_SEARCH_WIDTH)
+        searchEntry.bind("<Return>", lambda event: self._searchEvent())
+
+        searchButton = \
+            tkinter.Button(upDownButtonFrame, text="SEARCH", command=self._searchEvent,
+                           width=_BUTTON_WIDTH, height=_BUTTON_LENGTH)
+
         upButton.grid(row=0, column=0)
         downButton.grid(row=1, column=0)
+        searchEntry.grid(row=2, column=0, pady=(10, 0))
+        searchButton.grid(row=3, column=0)
         upDownButtonFrame.grid(row=0, column=1)
 
         # Construct the frame of radio buttons for determining the sorting technique
@@ -176,6 +215,52 @@ class ViewCollectionFrame:
         backButton.grid(row=0, column=1)
         deleteBackFrame.grid(row=1, column=0)
 
+        # Construct the filter panel, which restricts browsing to the books published, of a length, or added within
+        # the entered ranges, and by the entered author
+        filterFrame = tkinter.Frame(self.viewCollectionFrame, padx=10, pady=10)
+
+        filterYearLabel = tkinter.Label(filterFrame, text="Year Published:", font="TkFixedFont")
+        filterYearFromEntry = \
+            tkinter.Entry(filterFrame, textvariable=self.yearFrom, font="TkFixedFont", width=_FILTER_WIDTH)
+        filterYearToEntry = \
+            tkinter.Entry(filterFrame, textvariable=self.yearTo, font="TkFixedFont", width=_FILTER_WIDTH)
+
+        filterPagesLabel = tkinter.Label(filterFrame, text=" Page Length:", font="TkFixedFont")
+        filterPagesFromEntry = \
+            tkinter.Entry(filterFrame, textvariable=self.pagesFrom, font="TkFixedFont", width=_FILTER_WIDTH)
+        filterPagesToEntry = \
+            tkinter.Entry(filterFrame, textvariable=self.pagesTo, font="TkFixedFont", width=_FILTER_WIDTH)
+
+        filterAddedLabel = tkinter.Label(filterFrame, text="Added (Y-M-D): ", font="TkFixedFont")
+        filterAddedFromEntry = \
+            tkinter.Entry(filterFrame, textvariable=self.addedFrom, font="TkFixedFont", width=_FILTER_DATE_WIDTH)
+        filterAddedToEntry = \
+            tkinter.Entry(filterFrame, textvariable=self.addedTo, font="TkFixedFont", width=_FILTER_DATE_WIDTH)
+
+        filterAuthorLabel = tkinter.Label(filterFrame, text=" Author:", font="TkFixedFont")
+        filterAuthorEntry = \
+            tkinter.Entry(filterFrame, textvariable=self.filterAuthor, font="TkFixedFont", width=2 * _FILTER_WIDTH)
+
+        filterButton = \
+            tkinter.Button(filterFrame, text="FILTER BOOKS", command=self._filterEvent, width=_BUTTON_WIDTH)
+        clearFilterButton = \
+            tkinter.Button(filterFrame, text="SHOW ALL BOOKS", command=self._clearFilterEvent, width=_BUTTON_WIDTH)
+
+        filterYearLabel.grid(row=0, column=0, sticky=tkinter.W)
+        filterYearFromEntry.grid(row=0, column=1)
+        filterYearToEntry.grid(row=0, column=2)
+        filterPagesLabel.grid(row=0, column=3, sticky=tkinter.W)
+        filterPagesFromEntry.grid(row=0, column=4)
+        filterPagesToEntry.grid(row=0, column=5)
+        filterAddedLabel.grid(row=1, column=0, sticky=tkinter.W)
+        filterAddedFromEntry.grid(row=1, column=1)
+        filterAddedToEntry.grid(row=1, column=2)
+        filterAuthorLabel.grid(row=1, column=3, sticky=tkinter.W)
+        filterAuthorEntry.grid(row=1, column=4, columnspan=2)
+        filterButton.grid(row=0, column=6, padx=(20, 0))
+        clearFilterButton.grid(row=1, column=6, padx=(20, 0))
+        filterFrame.grid(row=2, column=0, columnspan=2)
+
         # Draw the frame to the window
         self.viewCollectionFrame.pack(padx=5, pady=5)
 
@@ -196,6 +281,43 @@ class ViewCollectionFrame:
 
         # End of destroy()
 
+    def refresh(self) -> None:
+        """
+        Redraws the current book after books were added, changed or removed outside the program.
+
+        Does nothing if the frame is not drawn. Backs out of this menu if no books are left.
+
+        :return: None
+        """
+
+        # If the frame is not drawn, there is nothing to redraw
+        if self.viewCollectionFrame is None:
+            return
+
+        # If no books are left, back out of this menu
+        if len(self.bookCollection.bookList) == 0:
+            messagebox.showwarning("ALL BOOKS REMOVED", "The last book was removed from the collection!")
+
+            self.backFunction()
+            return
+
+        # Find the books matching the filter again, and if none are left, go back to browsing the whole collection
+        self.filteredBooks = None
+
+        if self.activeFilter is not None and len(self._viewedBooks()) == 0:
+            messagebox.showinfo("FILTER CLEARED", "No books match the filter any more." +
+                                "\n\nShowing the whole collection again.")
+
+            self._clearFilter()
+
+        # If the current book was at the end of the list, move back to the new last book
+        if self.currentBookIndex >= len(self._viewedBooks()):
+            self.currentBookIndex = len(self._viewedBooks()) - 1
+
+        self._drawCurrentBook()
+
+        # End of refresh()
+
     def _up(self) -> None:
         """
         Button Event Function to give the view collection frame's "UP" button.
@@ -225,7 +347,7 @@ class ViewCollectionFrame:
 
         # If the user is at the last book in the list (i.e. can't go forward)
         # present an error dialog and abort the event
-        if self.currentBookIndex >= len(self.bookCollection.bookList) - 1:
+        if self.currentBookIndex >= len(self._viewedBooks()) - 1:
             messagebox.showerror("ERROR", "Reached end of collection. Cannot go further forward!")
         else:
             self.currentBookIndex += 1
@@ -272,15 +394,18 @@ class ViewCollectionFrame:
         """
 
         # Get the current book
-        currentBook = self.bookCollection.bookList[self.currentBookIndex]
+        currentBook = self._viewedBooks()[self.currentBookIndex]
+
+        # Mark the book number as counting the filtered books only when a filter is in use
+        filteredText = "" if self.activeFilter is None else " (filtered)"
 
         # Get the max length of the book's attributes, and set the bar length to that value plus 3
         barLength = max([len(currentBook.title), len(currentBook.author), len(str(currentBook.yearPub)),
                          len(str(currentBook.pageLength)),
-                         len(time.asctime(time.localtime(float(currentBook.dateAdded))))]) + 3
+                         len(time.asctime(time.localtime(currentBook.dateAdded)))]) + 3
 
         return "|-----------------|" + ("-" * barLength) + (" " * 5) + \
-               f"\n| Book Number     | {self.currentBookIndex + 1} of {len(self.bookCollection.bookList)}" + \
+               f"\n| Book Number     | {self.currentBookIndex + 1} of {len(self._viewedBooks())}{filteredText}" + \
                "\n|-----------------|" + ("-" * barLength) + (" " * 5) + \
                "\n|-----------------|" + ("-" * barLength) + (" " * 5) + \
                f"\n| Title           | {currentBook.title}" + \
@@ -291,11 +416,75 @@ class ViewCollectionFrame:
                "\n|-----------------|" + ("-" * barLength) + (" " * 5) + \
                f"\n| Page Length     | {currentBook.pageLength}" + \
                "\n|-----------------|" + ("-" * barLength) + (" " * 5) + \
-               f"\n| Date Added      | {time.asctime(time.localtime(float(currentBook.dateAdded)))}" + \
+               f"\n| Date Added      | {time.asctime(time.localtime(currentBook.dateAdded))}" + \
                "\n|-----------------|" + ("-" * barLength) + (" " * 5)
 
         # End of getCurrentBookText()
 
+    def _searchEvent(self) -> None:
+        """
+        Button Event Function to give the view collection frame's "SEARCH" button.
+
+        Searches the titles and authors of the collection for the entered words, the last of which may be the start
+        of a word, and draws the best match. Searching again for the same words draws the next match.
+
+        :return: None
+        """
+
+        query = self.searchQuery.get().strip()
+
+        # If no words were entered, just show an error
+        if query == "":
+            messagebox.showerror("ERROR", "No search words were entered!")
+            return
+
+        # A new search finds the best matches, searching again steps to the next one
+        if query != self.lastSearchQuery or not self.searchResults:
+            # Treat the last word as the start of a word, so partly typed words still match
+            self.searchResults = self.bookCollection.search(query if query.endswith("*") else query + "*",
+                                                            _SEARCH_RESULTS)
+            self.searchResultIndex = 0
+            self.lastSearchQuery = query
+
+            # If no word matched as typed, look for similarly spelled words instead
+            if not self.searchResults:
+                self.searchResults = self.bookCollection.fuzzySearch(query, limit=_SEARCH_RESULTS)
+
+                if self.searchResults:
+                    messagebox.showinfo("SIMILAR RESULTS", "No book matches: " + query +
+                                        "\n\nShowing books with similarly spelled titles and authors instead.")
+        else:
+            self.searchResultIndex = (self.searchResultIndex + 1) % len(self.searchResults)
+
+        # If nothing matched, tell the user and end the event
+        if not self.searchResults:
+            messagebox.showinfo("NO RESULTS", "No book's title or author matches: " + query)
+            return
+
+        # If the matched book was removed since the search, search again
+        recordId = self.searchResults[self.searchResultIndex].recordId
+
+        if recordId not in self.bookCollection:
+            self.searchResults = []
+            self._searchEvent()
+            return
+
+        # If the matched book does not match the filter, go back to browsing the whole collection
+        position = self._positionOf(recordId)
+
+        if position is None:
+            messagebox.showinfo("FILTER CLEARED", "The matched book does not match the filter." +
+                                "\n\nShowing the whole collection again.")
+
+            self._clearFilter()
+            position = self._positionOf(recordId)
+
+        # Draw the matched book
+        self.currentBookIndex = position
+        self._drawCurrentBook()
+
+        # End of searchEvent()
+
     def _radioSortEvent(self) -> None:
         """
         Sorts the books held in the collection by the technique specified by the clicked radio button widget.
@@ -305,6 +494,23 @@ class ViewCollectionFrame:
         :return: None
         """
 
+        self._sortBySelectedTechnique()
+
+        # Redraw the new current book
+        self._drawCurrentBook()
+        return
+
+        # End of radioTitleEvent()
+
+    def _sortBySelectedTechnique(self) -> None:
+        """
+        Sorts the books held in the collection by the technique selected with the radio button widgets.
+
+        Sorting by date added does not need to read every book of a lazily loaded collection, the other techniques do.
+
+        :return: None
+        """
+
         # Get the technique by which the user wishes to sort the books
         sortingTechnique = self.sortingTechnique.get()
 
@@ -320,11 +526,163 @@ class ViewCollectionFrame:
         elif sortingTechnique == _SORT_DATE_ADDED:
             sortModules.sortByDate(self.bookCollection)
 
-        # Redraw the new current book
+        # The filtered books are kept in the sorted order, so they need finding again
+        self.filteredBooks = None
+
+        # End of sortBySelectedTechnique()
+
+    def _filterEvent(self) -> None:
+        """
+        Button Event Function to give the view collection frame's "FILTER BOOKS" button.
+
+        Restricts browsing to the books within the entered year published, page length and date added ranges, and by
+        the entered author. Either end of a range may be left empty, and empty fields are not filtered on.
+
+        :return: None
+        """
+
+        # Read the entered ranges, and if any of them cannot be read, show an error and end the event
+        try:
+            yearPub = self._filterRange(self.yearFrom, self.yearTo, int)
+            pageLength = self._filterRange(self.pagesFrom, self.pagesTo, int)
+            dateAdded = self._filterRange(self.addedFrom, self.addedTo, self._filterDate)
+        except ValueError:
+            messagebox.showerror("ERROR", "Cannot filter the books!\n\nThe year published and page length must be " +
+                                 "whole numbers, and the dates added must be written as year-month-day, " +
+                                 "e.g. 2021-03-14.")
+            return
+
+        author = self.filterAuthor.get().strip()
+
+        # The end of the date added range includes the whole of that day
+        if dateAdded is not None and dateAdded[1] is not None:
+            dateAdded = (dateAdded[0], dateAdded[1] + 24 * 60 * 60 - 0.001)
+
+        bookFilter = {"yearPub": yearPub, "pageLength": pageLength, "dateAdded": dateAdded,
+                      "author": author if author != "" else None}
+
+        # If nothing was entered, just show an error
+        if all(bounds is None for bounds in bookFilter.values()):
+            messagebox.showerror("ERROR", "No filter was entered!")
+            return
+
+        # If no books match, tell the user and keep browsing the books shown before
+        filteredBooks = self.bookCollection.query(**bookFilter)
+
+        if not filteredBooks:
+            messagebox.showinfo("NO RESULTS", "No book in the collection matches the filter.")
+            return
+
+        # Otherwise, browse the matching books from the first one
+        self.activeFilter = bookFilter
+        self.filteredBooks = filteredBooks
+        self.currentBookIndex = 0
         self._drawCurrentBook()
-        return
 
-        # End of radioTitleEvent()
+        # End of filterEvent()
+
+    def _clearFilterEvent(self) -> None:
+        """
+        Button Event Function to give the view collection frame's "SHOW ALL BOOKS" button.
+
+        Goes back to browsing the whole collection, from the first book.
+
+        :return: None
+        """
+
+        self._clearFilter()
+
+        self.currentBookIndex = 0
+        self._drawCurrentBook()
+
+        # End of clearFilterEvent()
+
+    def _clearFilter(self) -> None:
+        """
+        Stops filtering the books, so the whole collection is browsed again.
+
+        :return: None
+        """
+
+        self.activeFilter = None
+        self.filteredBooks = None
+
+        # End of clearFilter()
+
+    def _viewedBooks(self):
+        """
+        Returns the books being browsed: the books matching the filter in use, or otherwise the whole collection.
+
+        The matching books are found once and kept until the sorting technique or the collection changes.
+
+        :return: A sequence of the books being browsed, in the selected sorting order.
+        """
+
+        if self.activeFilter is None:
+            return self.bookCollection.bookList
+
+        if self.filteredBooks is None:
+            self.filteredBooks = self.bookCollection.query(**self.activeFilter)
+
+        return self.filteredBooks
+
+        # End of viewedBooks()
+
+    def _positionOf(self, recordId: str):
+        """
+        Returns the position of a book among the books being browsed.
+
+        :param recordId: The record id of the book to find.
+        :return: The position of the book as an int, or None if the book does not match the filter in use.
+        """
+
+        if self.activeFilter is None:
+            return self.bookCollection.positionOf(recordId)
+
+        for position, book in enumerate(self._viewedBooks()):
+            if book.recordId == recordId:
+                return position
+
+        return None
+
+        # End of positionOf()
+
+    @staticmethod
+    def _filterRange(fromEntry: tkinter.StringVar, toEntry: tkinter.StringVar, convert):
+        """
+        Returns the range entered into a pair of filter entry fields.
+
+        :param fromEntry: The variable of the entry field for the lowest value to match.
+        :param toEntry: The variable of the entry field for the highest value to match.
+        :param convert: The function converting the entered text into a value.
+        :return: A tuple of the lowest and highest values, either of which is None if left empty, or None if both were
+        left empty.
+        :raises ValueError: If an entered value cannot be converted
+        """
+
+        low = fromEntry.get().strip()
+        high = toEntry.get().strip()
+
+        if low == "" and high == "":
+            return None
+
+        return (convert(low) if low != "" else None), (convert(high) if high != "" else None)
+
+        # End of filterRange()
+
+    @staticmethod
+    def _filterDate(text: str) -> float:
+        """
+        Returns the timestamp of the start of the day written in a date added filter entry field.
+
+        :param text: The date written as year-month-day.
+        :return: The timestamp of midnight at the start of that day, in local time.
+        :raises ValueError: If the date cannot be read
+        """
+
+        return time.mktime(time.strptime(text, _FILTER_DATE_FORMAT))
+
+        # End of filterDate()
 
     def _deleteEvent(self) -> None:
         """
@@ -337,12 +695,12 @@ class ViewCollectionFrame:
         currentBook = None
 
         try:
-            currentBook = self.bookCollection.bookList[self.currentBookIndex]
+            currentBook = self._viewedBooks()[self.currentBookIndex]
         except IndexError:
             messagebox.showerror("ERROR", "No book to delete!")
             return
 
-        # Attempt to delete the book from the collection using its date added
+        # Attempt to delete the book from the collection using its record id
         try:
             # Ask the user to confirm the deletion, otherwise end the event
             if not messagebox.askokcancel("CONFIRM BOOK DELETION", "Confirm the book to delete:\n\n" +
@@ -351,59 +709,28 @@ class ViewCollectionFrame:
                                                                    "\n\nYear Published:\n" + str(currentBook.yearPub) +
                                                                    "\n\nDated Added:\n" +
                                                                    time.asctime(
-                                                                       time.localtime(float(currentBook.dateAdded)))):
+                                                                       time.localtime(currentBook.dateAdded))):
                 return
 
-            FileLoader.deleteBook(self.bookCollection, currentBook.dateAdded)
+            FileLoader.deleteBook(self.bookCollection, currentBook.recordId)
             messagebox.showinfo("BOOK DELETED", "The book was deleted successfully.")
 
             # If that removed the last book in the list, back out of this menu,
             # otherwise, draw the new current book
-            if len(self.bookCollection.bookList) == 0:
-                messagebox.showwarning("ALL BOOKS REMOVED", "The last book was removed from the collection!")
-
-                self.backFunction()
-            else:
-                # if the current index is the last index, we need to decrement the number
-                if self.currentBookIndex == len(self.bookCollection.bookList):
-                    self.currentBookIndex -= 1
+            self.refresh()
 
-                self._drawCurrentBook()
-
-        # If the deletion failed, a .book file was removed outside the program, restart the view collection frame
+        # If the deletion failed, the .book file was removed outside the program before the collection watcher
+        # noticed, so drop the book from the collection and show the next one
         except BookNotFoundError as message:
             # Tell the user what happened with message boxes
             messagebox.showerror("ERROR", message)
-            messagebox.showinfo("RESTARTING WINDOW", "A book file was removed outside the program." +
-                                "\n\nThe collection view will restart!")
-
-            # Attempt to reload the library's directory
-            updatedLibrary = None
-
-            try:
-                updatedLibrary = FileLoader.loadFile(self.bookCollection.path)
-
-            # If the entire directory is missing, jump back to the main menu
-            except BadPathError:
-                messagebox.showinfo("ATTENTION", "The entire collection directory was removed outside the program!" +
-                                    "\n\nReturning to main menu...")
-                self.crashToMainMenuFunction()
-                return
-
-            # Copy the newly loaded library's books and save it to this one
-            self.bookCollection.bookList = copy.deepcopy(updatedLibrary.bookList)
+            messagebox.showinfo("BOOK REMOVED", "The book file was removed outside the program." +
+                                "\n\nIt has been removed from the collection.")
 
-            # Attempt to re-draw the view collection frame
-            try:
-                self.destroy()
-                self.draw()
+            if currentBook.recordId in self.bookCollection:
+                self.bookCollection.removeBook(currentBook.recordId)
 
-            # If the collection was empty, back out of this menu
-            except AttributeError:
-                messagebox.showinfo("ATTENTION", "The collection directory no longer contains any books!")
-
-                self.backFunction()
-                return
+            self.refresh()
 
         # End of deleteEvent()
 
@@ -1,5 +1,7 @@
 from collections import namedtuple
 from datetime import datetime
+from bisect import bisect_left, bisect_right, insort
+from operator import attrgetter
 
 '''
 used for testing purposes
@@ -25,34 +27,81 @@ listOfBooks.append(k)
 ### the instances have a sub-sorting using their title and go in ABC order
 ###
 ### sorted usage adapted from: https://docs.python.org/3/howto/sorting.html
+###
+### Book fields are already typed when a collection is loaded (yearPub and pageLength are ints, dateAdded is a float)
+### so the sort keys read them directly instead of converting every element on every sort
+###
+### Each sort is kept as an order permutation: the list of the library's slot numbers in sorted order.
+### The library caches one permutation per sort key, so switching between sorts only changes which cached
+### permutation bookList reads through. Books added later are placed into every cached permutation by binary search
+### (bisect) using the same keys, and removed books are found and taken out the same way, so a permutation never has
+### to be sorted or rebuilt again once it is built.
+
+SORT_KEYS = {"title": attrgetter("title"),
+             "author": attrgetter("author", "title"),
+             "year": attrgetter("yearPub", "title"),
+             "pages": attrgetter("pageLength", "title"),
+             "date": attrgetter("dateAdded", "recordId")}
+
+### Every order also serves as a sorted column of its first field, so range queries on yearPub, pageLength and
+### dateAdded and exact author lookups find their matches by binary search over the order (see Library.query)
+
+RANGE_ORDERS = {"yearPub": "year",
+                "pageLength": "pages",
+                "dateAdded": "date",
+                "author": "author"}
+
+def buildOrder(slots, key):
+    'takes a library slot array and a name from SORT_KEYS. Returns the slot numbers of every book in the slot array, sorted by that key'
+    keyFunction = SORT_KEYS[key]
+    return sorted((slot for slot in range(len(slots)) if slots[slot] is not None), key=lambda slot: keyFunction(slots[slot]))
+
+def insertIntoOrder(slots, order, slot, key):
+    'takes a library slot array, an order built by buildOrder, a new slot number and the name of the order key. Places the slot into the order by binary search. Returns nothing'
+    keyFunction = SORT_KEYS[key]
+    insort(order, slot, key=lambda slot: keyFunction(slots[slot]))
+
+def removeFromOrder(slots, order, slot, key):
+    'takes a library slot array, an order built by buildOrder, the slot number of a book about to be removed (still in the slot array) and the name of the order key. Takes the slot out of the order, found by binary search. Returns nothing'
+    del order[positionInOrder(slots, order, slot, key)]
+
+def positionInOrder(slots, order, slot, key):
+    'takes a library slot array, an order built by buildOrder, a slot number in it and the name of the order key. Returns the position of the slot in the order, found by binary search'
+    keyFunction = SORT_KEYS[key]
+    target = keyFunction(slots[slot])
+    position = bisect_left(order, target, key=lambda slot: keyFunction(slots[slot]))
+    while order[position] != slot: #books with equal keys sit next to each other
+        position += 1
+    return position
+
+def rangeInOrder(slots, order, field, low, high):
+    'takes a library slot array, the order named for field in RANGE_ORDERS, the field and the lowest and highest values to match (None for an open end). Returns the start and end positions of the matching slots in the order, found by binary search'
+    getValue = attrgetter(field)
+    start = 0 if low is None else bisect_left(order, low, key=lambda slot: getValue(slots[slot]))
+    end = len(order) if high is None else bisect_right(order, high, lo=start, key=lambda slot: getValue(slots[slot]))
+    return start, max(start, end)
 
 def sortByAuthor(library):
     'takes library object as input, sorts by author. Returns updated library object'
-    tempList = library.bookList
-    library.bookList = sorted(tempList, key=lambda Book: (Book[1],Book[0]))
+    library.useOrder("author")
     return library
 
 def sortByPages(library):
     'takes library object as input. Sorts from smallest page count to highest page count. Returns updated library object'
-    tempList = library.bookList
-    library.bookList = sorted(tempList, key=lambda Book: (int(Book[3]), Book[0]))
+    library.useOrder("pages")
     return library
 
 def sortByYear(library):
     'takes library object as input. Sorts from oldest to newest by year looking at the books publishing year. Returns updated library object'
-    tempList = library.bookList
-    library.bookList = sorted(tempList, key = lambda Book: (int(Book[2]), Book[0]))
+    library.useOrder("year")
     return library
 
 def sortByTitle(library):
     'takes library object as input. Sorts titles in ABC order. Returns updated library object' 
-    tempList = library.bookList
-    library.bookList = sorted(tempList, key=lambda Book: Book[0])
+    library.useOrder("title")
     return library
 
 def sortByDate(library):
     'takes library object as input. Sorts from oldest to newest in terms of when the book was first added to the library database. Returns updated library object'
-    tempList = library.bookList
-    library.bookList = sorted(tempList, key=lambda Book: float((Book[4])))
+    library.useOrder("date")
     return library
-
@@ -0,0 +1,93 @@
+import os
+import shutil
+import tempfile
+import unittest
+import zlib
+
+import FileLoader
+
+### Crash consistency of the write-ahead journal
+###
+### Each test leaves a journal file behind the way a crash at some point of a write would, then loads the collection
+### and checks what survived. Run with python -m pytest or python -m unittest.
+
+class JournalCrashTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.journalPath = os.path.join(self.directory, FileLoader.JOURNAL_FILE)
+
+    def tearDown(self):
+        FileLoader._closeJournals()
+        shutil.rmtree(self.directory)
+
+    def _frame(self, changes):
+        'takes a list of (op, record id, book) changes. Returns them as one journal frame'
+        body = b"".join(FileLoader._encodeRecord(op, recordId, book) for op, recordId, book in changes)
+        return FileLoader._JOURNAL_FRAME.pack(len(body), zlib.crc32(body)) + body
+
+    def _books(self, *titles):
+        return [FileLoader._newBook(title, "Author", 2000, 100) for title in titles]
+
+    def _bookFiles(self):
+        return sorted(name for name in os.listdir(self.directory) if name.endswith(".book"))
+
+    def testEmptyJournalIsStartedAgain(self):
+        open(self.journalPath, "wb").close() #a crash before the new journal's header reached the disk
+        self.assertEqual(len(FileLoader.loadFile(self.directory)), 0)
+        library = FileLoader.loadFile(self.directory, journal = True)
+        FileLoader.addBook(library, "Title", "Author", 2000, 100)
+        with open(self.journalPath, "rb") as journalFile:
+            self.assertTrue(journalFile.read().startswith(FileLoader._JOURNAL_MAGIC))
+        self.assertEqual(len(self._bookFiles()), 1)
+
+    def testPartialHeaderIsStartedAgain(self):
+        with open(self.journalPath, "wb") as journalFile:
+            journalFile.write(FileLoader._JOURNAL_MAGIC[:3])
+        library = FileLoader.loadFile(self.directory, journal = True)
+        self.assertEqual(len(library), 0)
+        with open(self.journalPath, "rb") as journalFile:
+            self.assertEqual(journalFile.read(), FileLoader._JOURNAL_MAGIC)
+
+    def testWrongHeaderIsDamage(self):
+        with open(self.journalPath, "wb") as journalFile:
+            journalFile.write(b"NOTAJRNL")
+        with self.assertRaises(FileLoader.BadPathError):
+            FileLoader.loadFile(self.directory)
+
+    def testCommittedGroupsAreReplayed(self):
+        kept, removed = self._books("Kept", "Removed")
+        with open(self.journalPath, "wb") as journalFile: #both groups were fsynced, neither was applied
+            journalFile.write(FileLoader._JOURNAL_MAGIC)
+            journalFile.write(self._frame([(FileLoader._OP_ADD, book.recordId, book) for book in (kept, removed)]))
+            journalFile.write(self._frame([(FileLoader._OP_DELETE, removed.recordId, None)]))
+        library = FileLoader.loadFile(self.directory)
+        self.assertEqual([book.title for book in library.bookList], ["Kept"])
+        self.assertEqual(self._bookFiles(), [kept.recordId + ".book"])
+        self.assertEqual(os.path.getsize(self.journalPath), len(FileLoader._JOURNAL_MAGIC)) #checkpointed once applied
+
+    def testTornGroupIsDropped(self):
+        committed, torn = self._books("Committed", "Torn")
+        tornFrame = self._frame([(FileLoader._OP_ADD, torn.recordId, torn)])
+        with open(self.journalPath, "wb") as journalFile: #the crash came while the second group was being written
+            journalFile.write(FileLoader._JOURNAL_MAGIC)
+            journalFile.write(self._frame([(FileLoader._OP_ADD, committed.recordId, committed)]))
+            journalFile.write(tornFrame[:len(tornFrame) - 5])
+        library = FileLoader.loadFile(self.directory, journal = True)
+        self.assertEqual([book.title for book in library.bookList], ["Committed"])
+        FileLoader.addBook(library, "After", "Author", 2000, 100) #later groups still replay after the torn one is gone
+        FileLoader._closeJournals()
+        self.assertEqual(sorted(book.title for book in FileLoader.loadFile(self.directory).bookList),
+                         ["After", "Committed"])
+
+    def testCorruptGroupIsDropped(self):
+        committed, corrupt = self._books("Committed", "Corrupt")
+        corruptFrame = bytearray(self._frame([(FileLoader._OP_ADD, corrupt.recordId, corrupt)]))
+        corruptFrame[-1] ^= 0xFF #fails its checksum
+        with open(self.journalPath, "wb") as journalFile:
+            journalFile.write(FileLoader._JOURNAL_MAGIC)
+            journalFile.write(self._frame([(FileLoader._OP_ADD, committed.recordId, committed)]))
+            journalFile.write(bytes(corruptFrame))
+        self.assertEqual([book.title for book in FileLoader.loadFile(self.directory).bookList], ["Committed"])
+
+if __name__ == "__main__":
+    unittest.main()